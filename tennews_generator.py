@@ -2,14 +2,32 @@
 # Automated news selection and generation for Next.js website
 
 import requests
+from requests.adapters import HTTPAdapter
 import json
+import hashlib
+import codecs
+import itertools
+import functools
+import collections
 from datetime import datetime, timedelta, timezone
 import time
 import os
+import sqlite3
+import argparse
 from bs4 import BeautifulSoup
 import re
 import pytz
 import pandas as pd
+import numpy as np
+import zlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from email.utils import parsedate_to_datetime
+
+try:
+    import lxml.html as lxml_html   # Optional fast path for article extraction
+except ImportError:
+    lxml_html = None
 
 # ==================== API KEY CONFIGURATION ====================
 # Get API key from GitHub secrets (for automation) or environment variable
@@ -19,8 +37,13 @@ CLAUDE_API_KEY = os.environ.get('CLAUDE_API_KEY', 'your-api-key-here-for-testing
 CLAUDE_MODEL = "claude-opus-4-1-20250805"
 CLAUDE_SONNET_MODEL = "claude-3-5-sonnet-20241022"
 
+# Messages API base URL (override to point at a local stand-in server)
+CLAUDE_API_BASE_URL = os.environ.get('CLAUDE_API_BASE_URL', 'https://api.anthropic.com').rstrip('/')
+
 # Files for storage
-EXCEL_FILE = 'news_archive.xlsx'
+ARCHIVE_DB = 'news_archive.db'
+EXCEL_FILE = 'news_archive.xlsx'   # Legacy archive; migrated into ARCHIVE_DB, optional export
+EXCEL_EXPORT = os.environ.get('TENNEWS_EXCEL_EXPORT') == '1'   # Also rewrite EXCEL_FILE after each run
 OUTPUT_JSON = 'public/news_data.json'
 
 # ==================== APPROVED NEWS SOURCES ====================
@@ -58,96 +81,388 @@ ALLOWED_DOMAINS = [
 
 ALLOWED_DOMAINS_SET = set(ALLOWED_DOMAINS)
 
-# ==================== EXCEL STORAGE FUNCTIONS ====================
-def initialize_excel_file():
-    """Create Excel file if it doesn't exist"""
-    if not os.path.exists(EXCEL_FILE):
-        print("📊 Creating new Excel archive file...")
-        df = pd.DataFrame(columns=[
-            'Date', 'Rank', 'Title', 'Summary', 'Source', 'URL', 
-            'Category', 'Importance', 'DailyGreeting', 'ReadingTime',
-            'FormattedDate', 'Emoji'
-        ])
-        df.to_excel(EXCEL_FILE, index=False, engine='openpyxl')
-        print("✅ Excel archive created!")
+# ==================== CACHE CONFIGURATION ====================
+CACHE_DIR = '.cache'
+GDELT_CACHE_DIR = os.path.join(CACHE_DIR, 'gdelt')
+GDELT_CACHE_TTL_SECONDS = 3 * 60 * 60    # Reruns within this window reuse raw GDELT responses
+GDELT_CACHE_MAX_ENTRIES = 400            # Oldest responses are evicted beyond this
+GDELT_STATE_FILE = os.path.join(CACHE_DIR, 'gdelt_state.json')   # Per-query watermarks + candidates
+GDELT_WINDOW_HOURS = 24                  # Rolling candidate window
+SCRAPE_RULES_FILE = os.path.join(CACHE_DIR, 'scrape_rules.json')   # Learned article selector per domain
+SCRAPE_HEALTH_FILE = os.path.join(CACHE_DIR, 'scrape_health.json') # Recent scrape outcomes per domain
+CLAUDE_CACHE_DIR = os.path.join(CACHE_DIR, 'claude')
+CLAUDE_CACHE_TTL_SECONDS = 36 * 60 * 60  # Identical calls within this window are answered locally
+CLAUDE_CACHE_MAX_BYTES = 50 * 1024 * 1024
+CLAUDE_CACHE_BYPASS = os.environ.get('CLAUDE_CACHE_BYPASS') == '1'
+
+# ==================== NEAR-DUPLICATE DETECTION CONFIGURATION ====================
+NEAR_DUP_NUM_PERM = 64                   # MinHash permutations per headline
+NEAR_DUP_BANDS = 32                      # LSH bands (NUM_PERM / BANDS rows each)
+NEAR_DUP_AUTO_MERGE_THRESHOLD = 0.7      # Jaccard at or above this is collapsed without Claude
+NEAR_DUP_REVIEW_THRESHOLD = 0.3          # Jaccard between the thresholds is sent to Claude
+
+# ==================== LOCAL PRE-RANKING CONFIGURATION ====================
+PRERANK_TOP_K_PER_CATEGORY = 150         # Candidates per category that reach the LLM phases
+PRERANK_WEIGHTS = {
+    'query_hits': 0.3,                   # How many category queries returned the same URL
+    'source_tier': 0.25,                 # PRERANK_SOURCE_TIERS below
+    'recency': 0.15,                     # Newer seendate scores higher
+    'keywords': 0.2,                     # PRERANK_KEYWORD_WEIGHTS found in the headline
+    'scrape_health': 0.1                 # Scrape success rate of the source (see SCRAPE_HEALTH_FILE)
+}
+PRERANK_SOURCE_TIERS = {
+    1: {"reuters.com", "apnews.com", "afp.com", "bbc.com", "nytimes.com", "washingtonpost.com",
+        "wsj.com", "ft.com", "bloomberg.com", "theguardian.com", "aljazeera.com", "npr.org",
+        "cnn.com", "nature.com", "science.org"},
+    2: {"cnbc.com", "nbcnews.com", "abcnews.go.com", "cbsnews.com", "foxnews.com", "usatoday.com",
+        "politico.com", "politico.eu", "axios.com", "france24.com", "lemonde.fr", "spiegel.de",
+        "scmp.com", "japantimes.co.jp", "straitstimes.com", "thehindu.com", "asia.nikkei.com",
+        "euronews.com", "telegraph.co.uk", "independent.co.uk", "thetimes.co.uk", "marketwatch.com",
+        "barrons.com", "forbes.com", "fortune.com", "businessinsider.com", "techcrunch.com",
+        "theverge.com", "wired.com", "arstechnica.com", "newscientist.com", "scientificamerican.com",
+        "thelancet.com", "nejm.org", "cell.com"}
+}
+PRERANK_TIER_SCORES = {1: 1.0, 2: 0.6, 3: 0.3}   # Tier 3 is every other approved source
+PRERANK_KEYWORD_WEIGHTS = {
+    'breaking': 0.4, 'killed': 0.5, 'kills': 0.5, 'dead': 0.4, 'dies': 0.4, 'war': 0.5, 'invasion': 0.6,
+    'ceasefire': 0.5, 'attack': 0.4, 'explosion': 0.4, 'coup': 0.6, 'earthquake': 0.6,
+    'tsunami': 0.6, 'hurricane': 0.5, 'wildfire': 0.4, 'flood': 0.4, 'pandemic': 0.5,
+    'outbreak': 0.4, 'election': 0.4, 'sanctions': 0.4, 'summit': 0.3, 'tariff': 0.3,
+    'tariffs': 0.3, 'resigns': 0.4, 'crisis': 0.4, 'recession': 0.5, 'inflation': 0.3,
+    'billion': 0.3, 'trillion': 0.4, 'record': 0.3, 'breakthrough': 0.4, 'historic': 0.3
+}
+
+# ==================== LLM BATCHING CONFIGURATION ====================
+DEDUP_MAX_WORKERS = 4                    # Deduplication prompts in flight at the same time
+DEDUP_MAX_ROUNDS = 3                     # Extra rounds reconcile duplicates split across batches
+SELECTION_MAX_WORKERS = 4                # Selection prompts in flight at the same time
+SELECTION_FAN_IN = 200                   # Most candidates in one selection prompt (each batch keeps 10)
+DEDUP_MAX_ROWS = 150                     # Most candidates in one dedup prompt (bounds the reply size)
+PROMPT_TOKEN_BUDGET = 12000              # Input tokens to fill per dedup/selection prompt
+PROMPT_CHARS_PER_TOKEN = 3.5             # Local estimate used to size batches
+CLAUDE_RATE_LIMIT_PER_SECOND = 1.0       # Request rate shared by all concurrent Claude calls
+CLAUDE_RATE_LIMIT_BURST = 4              # Requests that may start back-to-back
+CLAUDE_BATCH_MODE = os.environ.get('CLAUDE_BATCH_MODE') == '1'   # Send dedup/selection rounds as Message Batches
+CLAUDE_BATCH_POLL_SECONDS = 30           # Delay between batch status checks
+CLAUDE_BATCH_MAX_WAIT_SECONDS = 2 * 60 * 60   # Give up on a batch (and fall back to direct calls) after this
+CLAUDE_STREAM_IDLE_TIMEOUT = 30          # Seconds without stream data before a streamed call counts as stalled
+CLAUDE_STREAM_MAX_SECONDS = 10 * 60      # Wall-clock cap for one streamed response
+REWRITE_MAX_REQUESTS = 3                 # Rewrite calls per run, counting re-requests for missing articles
+
+# ==================== HTTP CLIENT CONFIGURATION ====================
+HTTP_POOL_CONNECTIONS = 32           # Per-host connection pools kept alive
+HTTP_POOL_MAXSIZE = 10               # Keep-alive connections per host
+HTTP_CONNECT_TIMEOUT = 5             # Seconds to establish a connection
+GDELT_READ_TIMEOUT = 30              # Seconds to wait for GDELT response data
+SCRAPE_READ_TIMEOUT = 10             # Seconds to wait for article page data
+SCRAPE_MAX_WORKERS = 8               # Article pages fetched at the same time
+SCRAPE_PER_HOST_LIMIT = 2            # Concurrent requests to any one host
+SCRAPE_PHASE_DEADLINE_SECONDS = 30   # Scraping phase returns whatever has arrived by then
+SCRAPE_MAX_BYTES = 1024 * 1024       # Stop downloading a page after this many bytes
+SCRAPE_MAX_CHARS = 2000              # Article text kept per page
+SCRAPE_HEDGE_DELAY_SECONDS = 3       # Try the next duplicate-cluster URL if a story has no text by then
+SCRAPE_MAX_ALTERNATES = 3            # Duplicate-cluster URLs tried per story besides its own
+SCRAPE_HEALTH_WINDOW = 30            # Outcomes kept per domain
+SCRAPE_HEALTH_MIN_SAMPLES = 5        # Outcomes needed before a domain's stats are trusted
+SCRAPE_SKIP_SUCCESS_RATE = 0.2       # Domains below this success rate are skipped...
+SCRAPE_SKIP_PROBE_HOURS = 72         # ...except for one probe request this often
+SCRAPE_MIN_READ_TIMEOUT = 3          # Floor for timeouts derived from a domain's p95 latency
+
+# ==================== GDELT FETCH CONFIGURATION ====================
+GDELT_API_URL = "https://api.gdeltproject.org/api/v2/doc/doc"
+GDELT_MAX_WORKERS = 4                # Queries in flight at the same time
+GDELT_RATE_LIMIT_PER_SECOND = 0.2    # Shared by all workers; GDELT allows about one request per 5 seconds
+GDELT_RATE_LIMIT_BURST = 1           # No bursts, so workers only overlap slow downloads, never requests
+GDELT_MAX_REQUEUES = 5               # Retries per query after 429s or transient errors
+GDELT_DEFAULT_RETRY_AFTER = 5        # Seconds to back off when no Retry-After header is sent
+GDELT_MAX_RETRY_AFTER = 60           # Never honour a Retry-After longer than this
+GDELT_STREAM_CHUNK_SIZE = 64 * 1024  # Bytes read per step while stream-parsing responses
+
+# ==================== ARCHIVE STORAGE FUNCTIONS ====================
+ARCHIVE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,
+    rank INTEGER,
+    title TEXT,
+    summary TEXT,
+    source TEXT,
+    url TEXT,
+    category TEXT,
+    importance TEXT,
+    daily_greeting TEXT,
+    reading_time TEXT,
+    formatted_date TEXT,
+    emoji TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_articles_date_url ON articles (date, url);
+CREATE INDEX IF NOT EXISTS idx_articles_url ON articles (url);
+CREATE TABLE IF NOT EXISTS archive_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
 
-def fetch_previous_articles_from_excel():
-    """Fetch the last 2 weeks of articles from Excel file"""
+# Full-text index over the archive, kept in sync by triggers on every write
+ARCHIVE_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+    title, summary, source, category,
+    content='articles', content_rowid='id', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS articles_fts_insert AFTER INSERT ON articles BEGIN
+    INSERT INTO articles_fts (rowid, title, summary, source, category)
+    VALUES (new.id, new.title, new.summary, new.source, new.category);
+END;
+CREATE TRIGGER IF NOT EXISTS articles_fts_delete AFTER DELETE ON articles BEGIN
+    INSERT INTO articles_fts (articles_fts, rowid, title, summary, source, category)
+    VALUES ('delete', old.id, old.title, old.summary, old.source, old.category);
+END;
+CREATE TRIGGER IF NOT EXISTS articles_fts_update AFTER UPDATE ON articles BEGIN
+    INSERT INTO articles_fts (articles_fts, rowid, title, summary, source, category)
+    VALUES ('delete', old.id, old.title, old.summary, old.source, old.category);
+    INSERT INTO articles_fts (rowid, title, summary, source, category)
+    VALUES (new.id, new.title, new.summary, new.source, new.category);
+END;
+"""
+ARCHIVE_SEARCH_WEIGHTS = (10.0, 3.0, 1.0, 1.0)   # bm25 weights for title, summary, source, category
+
+# Archive column -> legacy Excel column
+ARCHIVE_EXCEL_COLUMNS = {
+    'date': 'Date', 'rank': 'Rank', 'title': 'Title', 'summary': 'Summary', 'source': 'Source',
+    'url': 'URL', 'category': 'Category', 'importance': 'Importance',
+    'daily_greeting': 'DailyGreeting', 'reading_time': 'ReadingTime',
+    'formatted_date': 'FormattedDate', 'emoji': 'Emoji'
+}
+
+def connect_archive():
+    """Open the SQLite archive, creating the schema (and full-text index if FTS5 is available)"""
+    conn = sqlite3.connect(ARCHIVE_DB)
+    conn.executescript(ARCHIVE_SCHEMA)
+    if not archive_has_fts(conn):
+        try:
+            with conn:
+                conn.executescript(ARCHIVE_FTS_SCHEMA)
+                # Index rows archived before the full-text index existed
+                conn.execute("INSERT INTO articles_fts (articles_fts) VALUES ('rebuild')")
+        except sqlite3.OperationalError:
+            pass  # SQLite built without FTS5; search_archive falls back to LIKE
+    return conn
+
+def archive_has_fts(conn):
+    """True if the archive database has its full-text index"""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'articles_fts'"
+    ).fetchone() is not None
+
+def insert_archive_rows(conn, rows, overwrite=True):
+    """Insert archive rows (dicts keyed by archive column)
+    
+    A row for an already archived (date, url) updates it, or is ignored when
+    overwrite is False.
+    """
+    columns = list(ARCHIVE_EXCEL_COLUMNS)
+    # An upsert (not INSERT OR REPLACE) so the update trigger keeps the full-text index in sync
+    on_conflict = "DO UPDATE SET " + ', '.join(f'{column} = excluded.{column}' for column in columns)
+    conn.executemany(
+        f"INSERT INTO articles ({', '.join(columns)}) "
+        f"VALUES ({', '.join('?' for _ in columns)}) "
+        f"ON CONFLICT (date, url) {on_conflict if overwrite else 'DO NOTHING'}",
+        [tuple(row.get(column) for column in columns) for row in rows]
+    )
+
+def initialize_archive():
+    """Create the archive database, importing the legacy Excel archive until that succeeds
+    
+    The import and its completion marker are written in one transaction, so a
+    failed import leaves nothing behind and is retried on the next run.
+    """
     try:
-        if not os.path.exists(EXCEL_FILE):
-            print("📊 No previous articles found (new archive)")
-            return []
+        conn = connect_archive()
+    except sqlite3.Error as e:
+        print(f"❌ Could not open archive {ARCHIVE_DB}: {str(e)[:100]}")
+        return
+    
+    try:
+        migrated = conn.execute(
+            "SELECT value FROM archive_meta WHERE key = 'excel_migrated'"
+        ).fetchone()
+        if migrated or not os.path.exists(EXCEL_FILE):
+            return
         
-        print("\n📚 Reading previous articles from Excel...")
+        print("📊 Migrating Excel archive into SQLite...")
         df = pd.read_excel(EXCEL_FILE, engine='openpyxl')
+        df = df.rename(columns={excel: column for column, excel in ARCHIVE_EXCEL_COLUMNS.items()})
+        missing = [column for column in ('date', 'url') if column not in df.columns]
+        if missing:
+            raise ValueError(f"missing column(s) {', '.join(ARCHIVE_EXCEL_COLUMNS[m] for m in missing)}")
+        df = df[[column for column in ARCHIVE_EXCEL_COLUMNS if column in df.columns]]
+        df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
+        rows = df.astype(object).where(pd.notna(df), None).to_dict('records')
+        with conn:
+            insert_archive_rows(conn, rows, overwrite=False)
+            conn.execute(
+                "INSERT OR REPLACE INTO archive_meta (key, value) VALUES ('excel_migrated', ?)",
+                (datetime.now().isoformat(),)
+            )
+        print(f"✅ Migrated {len(rows)} articles to {ARCHIVE_DB}")
+    except Exception as e:
+        print(f"❌ Excel archive migration failed, will retry next run: {str(e)[:100]}")
+    finally:
+        conn.close()
+
+def fetch_previous_articles():
+    """Fetch the last 2 weeks of articles from the archive
+    
+    Only the four needed columns are read, and the date filter runs in SQLite
+    against the date index, so the cost depends on the window, not the archive.
+    """
+    try:
+        print("\n📚 Reading previous articles from archive...")
+        cutoff_date = (datetime.now() - timedelta(days=14)).strftime('%Y-%m-%d')
         
-        if df.empty:
-            print("📊 Excel file is empty (no previous articles)")
+        conn = connect_archive()
+        try:
+            recent_df = pd.read_sql_query(
+                "SELECT title, summary, source, url AS sourceUrl FROM articles "
+                "WHERE date >= ? ORDER BY date, rank",
+                conn,
+                params=(cutoff_date,)
+            )
+        finally:
+            conn.close()
+        
+        if recent_df.empty:
+            print("📊 No previous articles found (new archive)")
             return []
         
-        # Filter last 14 days
-        df['Date'] = pd.to_datetime(df['Date'])
-        cutoff_date = datetime.now() - timedelta(days=14)
-        recent_df = df[df['Date'] >= cutoff_date]
-        
-        previous_articles = []
-        for _, row in recent_df.iterrows():
-            previous_articles.append({
-                'title': row['Title'],
-                'summary': row['Summary'],
-                'source': row['Source'],
-                'sourceUrl': row['URL']
-            })
+        previous_articles = recent_df.astype(object).where(recent_df.notna(), None).to_dict('records')
         
         print(f"✅ Retrieved {len(previous_articles)} articles from last 2 weeks")
         return previous_articles
         
     except Exception as e:
-        print(f"⚠️ Error reading Excel: {str(e)[:100]}")
+        print(f"⚠️ Error reading archive: {str(e)[:100]}")
         return []
 
-def save_articles_to_excel(articles_data, daily_greeting, reading_time, formatted_date):
-    """Save today's articles to Excel file"""
+def save_articles_to_archive(articles_data, daily_greeting, reading_time, formatted_date):
+    """Append today's articles to the archive (and the Excel export when enabled)"""
     try:
-        print("\n💾 Saving articles to Excel archive...")
-        
-        # Read existing data or create new DataFrame
-        if os.path.exists(EXCEL_FILE):
-            df_existing = pd.read_excel(EXCEL_FILE, engine='openpyxl')
-        else:
-            df_existing = pd.DataFrame()
+        print("\n💾 Saving articles to archive...")
         
-        # Prepare new data
         new_rows = []
         for article in articles_data['articles']:
             new_rows.append({
-                'Date': datetime.now().strftime('%Y-%m-%d'),
-                'Rank': article['rank'],
-                'Title': article['title'],
-                'Summary': article['summary'],
-                'Source': article['source'],
-                'URL': article['url'],
-                'Category': article['category'],
-                'Importance': article.get('importance', 'High'),
-                'DailyGreeting': daily_greeting,
-                'ReadingTime': reading_time,
-                'FormattedDate': formatted_date,
-                'Emoji': article['emoji']
+                'date': datetime.now().strftime('%Y-%m-%d'),
+                'rank': article['rank'],
+                'title': article['title'],
+                'summary': article['summary'],
+                'source': article['source'],
+                'url': article['url'],
+                'category': article['category'],
+                'importance': article.get('importance', 'High'),
+                'daily_greeting': daily_greeting,
+                'reading_time': reading_time,
+                'formatted_date': formatted_date,
+                'emoji': article['emoji']
             })
         
-        df_new = pd.DataFrame(new_rows)
-        df_combined = pd.concat([df_existing, df_new], ignore_index=True)
+        conn = connect_archive()
+        try:
+            with conn:
+                insert_archive_rows(conn, new_rows)
+        finally:
+            conn.close()
+        print(f"✅ Saved {len(new_rows)} articles to {ARCHIVE_DB}")
         
-        # Save to Excel
-        df_combined.to_excel(EXCEL_FILE, index=False, engine='openpyxl')
-        print(f"✅ Saved {len(new_rows)} articles to Excel archive")
+        if EXCEL_EXPORT:
+            export_archive_to_excel()
         
         return True
         
     except Exception as e:
-        print(f"❌ Error saving to Excel: {str(e)[:100]}")
+        print(f"❌ Error saving to archive: {str(e)[:100]}")
         return False
 
+def search_archive(query, start_date=None, end_date=None, limit=20):
+    """Search archived digests by keyword, best matches first
+    
+    Every word in query must appear in the title, summary, source or category.
+    start_date/end_date ('YYYY-MM-DD', inclusive) narrow the date range.
+    Results are ranked with bm25 (title matches weigh most) when the archive has
+    its FTS5 index, otherwise matched with LIKE and ordered newest first.
+    """
+    terms = re.findall(r'\w+', query.lower())
+    if not terms:
+        return []
+    
+    filters = []
+    params = []
+    if start_date:
+        filters.append("a.date >= ?")
+        params.append(start_date)
+    if end_date:
+        filters.append("a.date <= ?")
+        params.append(end_date)
+    
+    conn = connect_archive()
+    try:
+        if archive_has_fts(conn):
+            sql = (
+                "SELECT a.date, a.rank, a.title, a.summary, a.source, a.url, a.category, "
+                f"bm25(articles_fts, {', '.join(str(weight) for weight in ARCHIVE_SEARCH_WEIGHTS)}) AS score "
+                "FROM articles_fts JOIN articles a ON a.id = articles_fts.rowid "
+                "WHERE articles_fts MATCH ?"
+            )
+            params.insert(0, ' '.join(f'"{term}"' for term in terms))
+            order = "score, a.date DESC"
+        else:
+            sql = ("SELECT a.date, a.rank, a.title, a.summary, a.source, a.url, a.category, NULL AS score "
+                   "FROM articles a WHERE 1 = 1")
+            for term in terms:
+                filters.append("(a.title LIKE ? OR a.summary LIKE ? OR a.source LIKE ? OR a.category LIKE ?)")
+                params.extend([f"%{term}%"] * 4)
+            order = "a.date DESC, a.rank"
+        
+        for condition in filters:
+            sql += f" AND {condition}"
+        sql += f" ORDER BY {order} LIMIT ?"
+        params.append(limit)
+        
+        results_df = pd.read_sql_query(sql, conn, params=params)
+    finally:
+        conn.close()
+    
+    return results_df.astype(object).where(results_df.notna(), None).to_dict('records')
+
+def run_search_command(args):
+    """Print search_archive results for the 'search' command line"""
+    started = time.perf_counter()
+    results = search_archive(' '.join(args.query), args.start_date, args.end_date, args.limit)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    
+    print(f"🔎 {len(results)} results for \"{' '.join(args.query)}\" ({elapsed_ms:.1f} ms)")
+    for result in results:
+        print(f"\n{result['date']}  #{result['rank']}  [{result['category']}]  {result['source']}")
+        print(f"   {result['title']}")
+        if result['summary']:
+            print(f"   {result['summary']}")
+        print(f"   {result['url']}")
+
+def export_archive_to_excel():
+    """Write the whole archive to EXCEL_FILE in the legacy column layout"""
+    try:
+        conn = connect_archive()
+        try:
+            df = pd.read_sql_query("SELECT * FROM articles ORDER BY date, rank", conn)
+        finally:
+            conn.close()
+        
+        df = df[list(ARCHIVE_EXCEL_COLUMNS)].rename(columns=ARCHIVE_EXCEL_COLUMNS)
+        df.to_excel(EXCEL_FILE, index=False, engine='openpyxl')
+        print(f"✅ Exported {len(df)} archived articles to {EXCEL_FILE}")
+    except Exception as e:
+        print(f"⚠️ Excel export failed: {str(e)[:100]}")
+
 # ==================== UTILITY FUNCTIONS ====================
 def clean_text_for_json(text):
     """Clean text to be JSON-safe"""
@@ -184,6 +499,104 @@ def clean_json_response(content):
     
     return content
 
+def find_json_object_end(text, start):
+    """Return the index of the brace closing the object at start, or -1 if not in text yet"""
+    depth = 0
+    in_string = False
+    escape_next = False
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escape_next:
+                escape_next = False
+            elif char == '\\':
+                escape_next = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                return i
+    return -1
+
+def iter_json_array_objects(chunks, array_key, repair=None):
+    """Yield the objects of the JSON array stored under array_key as text chunks arrive
+    
+    Only the current object is held in memory. Malformed objects are handed to
+    repair(text), which may return a dict or None to skip the object.
+    """
+    decoder = json.JSONDecoder()
+    chunks = iter(chunks)
+    state = {'buffer': '', 'pos': 0, 'exhausted': False}
+    
+    def fill():
+        chunk = next(chunks, None)
+        if chunk is None:
+            state['exhausted'] = True
+            return False
+        if state['pos'] > 65536:
+            state['buffer'] = state['buffer'][state['pos']:]
+            state['pos'] = 0
+        state['buffer'] += chunk
+        return True
+    
+    key_pattern = re.compile(r'"' + re.escape(array_key) + r'"\s*:\s*\[')
+    while True:
+        match = key_pattern.search(state['buffer'])
+        if match:
+            state['pos'] = match.end()
+            break
+        if not fill():
+            return
+    
+    while True:
+        buffer = state['buffer']
+        pos = state['pos']
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+        state['pos'] = pos
+        
+        if pos >= len(buffer):
+            if not fill():
+                return
+            continue
+        if buffer[pos] != '{':
+            return
+        
+        try:
+            obj, end = decoder.raw_decode(buffer, pos)
+            state['pos'] = end
+            yield obj
+            continue
+        except json.JSONDecodeError:
+            pass
+        
+        end = find_json_object_end(buffer, pos)
+        if end < 0:
+            if fill():
+                continue
+            end = len(buffer) - 1
+        
+        state['pos'] = end + 1
+        repaired = repair(buffer[pos:end + 1]) if repair else None
+        if repaired:
+            yield repaired
+
+def iter_decoded_chunks(byte_chunks):
+    """Decode a stream of UTF-8 byte chunks, dropping any BOM"""
+    decoder = codecs.getincrementaldecoder('utf-8-sig')(errors='replace')
+    for chunk in byte_chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
 def get_formatted_date():
     """Get formatted date in UK timezone - all capitals"""
     uk_tz = pytz.timezone('Europe/London')
@@ -239,7 +652,8 @@ Return in this EXACT format:
 
 Return ONLY the JSON, nothing else."""
     
-    response = call_claude_api_with_model(prompt, "Generating daily greeting and reading time", CLAUDE_SONNET_MODEL)
+    response = call_claude_api_with_model(prompt, "Generating daily greeting and reading time", CLAUDE_SONNET_MODEL,
+                                          validate=expects_json_keys('greeting'))
     
     if response:
         try:
@@ -320,7 +734,8 @@ Return ONLY a JSON object in this format:
 
 Return ONLY the JSON, nothing else."""
     
-    response = call_claude_api_with_model(prompt, "Generating historical events", CLAUDE_SONNET_MODEL)
+    response = call_claude_api_with_model(prompt, "Generating historical events", CLAUDE_SONNET_MODEL,
+                                          validate=expects_json_keys('events'))
     
     if response:
         try:
@@ -345,6 +760,186 @@ Return ONLY the JSON, nothing else."""
         {"year": "1968", "description": "Pope Paul VI arrives in Colombia, first papal visit"}
     ]
 
+# ==================== DISK CACHE ====================
+def make_cache_key(*parts):
+    """Build a content-addressed cache key from JSON-serialisable parts"""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def read_disk_cache(cache_dir, key, ttl_seconds):
+    """Return cached text for key, or None if missing or older than ttl_seconds"""
+    path = os.path.join(cache_dir, key)
+    try:
+        if time.time() - os.path.getmtime(path) > ttl_seconds:
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        return None
+
+def open_disk_cache(cache_dir, key, ttl_seconds):
+    """Open the cache entry for key for streaming reads, or return None if missing or stale"""
+    path = os.path.join(cache_dir, key)
+    try:
+        if time.time() - os.path.getmtime(path) > ttl_seconds:
+            return None
+        return open(path, 'r', encoding='utf-8')
+    except OSError:
+        return None
+
+def tee_to_disk_cache(chunks, cache_dir, key):
+    """Yield text chunks while copying them into the cache; committed only if fully consumed"""
+    path = os.path.join(cache_dir, key)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    cache_file = None
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        cache_file = open(tmp_path, 'w', encoding='utf-8')
+    except OSError as e:
+        print(f"   ⚠️ Could not write cache entry: {str(e)[:50]}")
+    
+    completed = False
+    try:
+        for chunk in chunks:
+            if cache_file:
+                cache_file.write(chunk)
+            yield chunk
+        completed = True
+    finally:
+        if cache_file:
+            cache_file.close()
+            try:
+                if completed:
+                    os.replace(tmp_path, path)
+                else:
+                    os.remove(tmp_path)
+            except OSError:
+                pass
+
+def write_disk_cache(cache_dir, key, text):
+    """Atomically store text under key"""
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        path = os.path.join(cache_dir, key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"   ⚠️ Could not write cache entry: {str(e)[:50]}")
+
+def evict_disk_cache(cache_dir, ttl_seconds, max_entries=None, max_bytes=None):
+    """Drop expired entries, then the oldest ones until under the entry and size caps"""
+    if not os.path.isdir(cache_dir):
+        return 0
+    
+    now = time.time()
+    entries = []
+    removed = 0
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        try:
+            stat = os.stat(path)
+            if name.endswith('.tmp') or now - stat.st_mtime > ttl_seconds:
+                os.remove(path)
+                removed += 1
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+        except OSError:
+            continue
+    
+    entries.sort()
+    total_bytes = sum(size for _, size, _ in entries)
+    while entries and ((max_entries is not None and len(entries) > max_entries) or
+                       (max_bytes is not None and total_bytes > max_bytes)):
+        _, size, path = entries.pop(0)
+        try:
+            os.remove(path)
+            removed += 1
+            total_bytes -= size
+        except OSError:
+            pass
+    
+    return removed
+
+# ==================== HTTP CLIENT ====================
+_http_session = None
+_http_session_lock = threading.Lock()
+
+def get_http_session():
+    """Return the shared keep-alive session used for GDELT, scraping and Claude calls"""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=HTTP_POOL_CONNECTIONS,
+                pool_maxsize=HTTP_POOL_MAXSIZE
+            )
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _http_session = session
+        return _http_session
+
+# ==================== RATE LIMITING ====================
+def create_rate_limiter(rate_per_second, burst):
+    """Create a thread-safe token bucket shared by concurrent workers"""
+    capacity = float(max(1, burst))
+    return {
+        'rate': max(0.001, float(rate_per_second)),
+        'capacity': capacity,
+        'tokens': capacity,
+        'updated': time.monotonic(),
+        'paused_until': 0.0,
+        'lock': threading.Lock()
+    }
+
+def acquire_rate_limit(limiter):
+    """Block until the token bucket allows one more request"""
+    while True:
+        with limiter['lock']:
+            now = time.monotonic()
+            if now < limiter['paused_until']:
+                wait_time = limiter['paused_until'] - now
+            else:
+                elapsed = now - limiter['updated']
+                limiter['tokens'] = min(limiter['capacity'], limiter['tokens'] + elapsed * limiter['rate'])
+                limiter['updated'] = now
+                if limiter['tokens'] >= 1:
+                    limiter['tokens'] -= 1
+                    return
+                wait_time = (1 - limiter['tokens']) / limiter['rate']
+        time.sleep(wait_time)
+
+def pause_rate_limit(limiter, seconds):
+    """Hold back every worker sharing this limiter, e.g. after a 429"""
+    with limiter['lock']:
+        limiter['paused_until'] = max(limiter['paused_until'], time.monotonic() + seconds)
+        limiter['updated'] = limiter['paused_until']
+        limiter['tokens'] = 0.0
+
+def parse_retry_after(header_value, default_seconds):
+    """Convert a Retry-After header (seconds or HTTP date) into seconds to wait"""
+    if not header_value:
+        return default_seconds
+    
+    try:
+        return max(0.0, float(header_value))
+    except ValueError:
+        pass
+    
+    try:
+        retry_at = parsedate_to_datetime(header_value)
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError, IndexError):
+        return default_seconds
+
+GDELT_RATE_LIMITER = create_rate_limiter(GDELT_RATE_LIMIT_PER_SECOND, GDELT_RATE_LIMIT_BURST)
+CLAUDE_RATE_LIMITER = create_rate_limiter(CLAUDE_RATE_LIMIT_PER_SECOND, CLAUDE_RATE_LIMIT_BURST)
+
+# ==================== GDELT FETCHING ====================
 def parse_gdelt_date(date_string):
     """Parse GDELT date format: 20250716T120000Z"""
     if not date_string or len(date_string) < 15:
@@ -372,7 +967,6 @@ def fetch_gdelt_news_last_24_hours():
     print("=" * 70)
     
     all_articles = []
-    url = "https://api.gdeltproject.org/api/v2/doc/doc"
     
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
@@ -464,112 +1058,334 @@ def fetch_gdelt_news_last_24_hours():
         40: "Elections"
     }
     
-    print("\n🔍 Searching for important news across categories...")
+    evicted = evict_disk_cache(GDELT_CACHE_DIR, GDELT_CACHE_TTL_SECONDS, max_entries=GDELT_CACHE_MAX_ENTRIES)
+    if evicted:
+        print(f"🧹 Evicted {evicted} stale GDELT cache entries")
     
+    now = datetime.now(timezone.utc)
+    window_start = now - timedelta(hours=GDELT_WINDOW_HOURS)
+    gdelt_state = load_gdelt_state()
+    results = {}
+    watermarks = {}
     for idx, query in enumerate(search_queries, 1):
-        label = query_labels.get(idx, f"Search {idx}")
-        print(f"\n📋 {label}: {query[:40]}...")
-        
-        params = {
-            "query": query,
-            "mode": "ArtList",
-            "format": "json",
-            "maxrecords": "250",
-            "timespan": "1d",
-            "sort": "hybridrel"
-        }
-        
-        try:
-            response = requests.get(url, params=params, headers=headers, timeout=30)
+        entry = gdelt_state.get(query, {})
+        if time.time() - entry.get('refreshed_at', 0) < GDELT_CACHE_TTL_SECONDS:
+            # Refreshed recently (e.g. a rerun after a late failure): reuse the stored candidates
+            results[idx] = {'status': 'ok', 'articles': merge_gdelt_candidates(gdelt_state, query, [], window_start),
+                            'rejected': 0, 'retry_after': 0, 'throttled': False}
+            continue
+        watermark = parse_gdelt_date(entry.get('watermark'))
+        if watermark and watermark > window_start:
+            watermarks[query] = watermark
+    if results:
+        print(f"♻️ {len(results)} queries were refreshed within the last "
+              f"{GDELT_CACHE_TTL_SECONDS // 3600}h, reusing their stored articles")
+    if watermarks:
+        print(f"📌 {len(watermarks)} queries resume from stored watermarks (fetching only new articles)")
+    
+    print(f"\n🔍 Searching for important news across categories ({GDELT_MAX_WORKERS} parallel workers)...")
+    
+    requeue_counts = {}
+    pending = [(0.0, idx) for idx in range(1, len(search_queries) + 1) if idx not in results]
+    in_flight = {}
+    
+    with ThreadPoolExecutor(max_workers=GDELT_MAX_WORKERS) as executor:
+        while pending or in_flight:
+            now = time.monotonic()
+            for item in [item for item in pending if item[0] <= now]:
+                pending.remove(item)
+                idx = item[1]
+                label = query_labels.get(idx, f"Search {idx}")
+                query = search_queries[idx - 1]
+                future = executor.submit(fetch_gdelt_query, query, label, headers, watermarks.get(query))
+                in_flight[future] = idx
             
-            if response.status_code == 200:
-                content = response.text
-                
-                if content.startswith('<!DOCTYPE') or content.startswith('<html'):
-                    print(f"   ❌ Got HTML response, skipping...")
-                    continue
+            next_ready = min(ready_at for ready_at, _ in pending) if pending else None
+            if not in_flight:
+                time.sleep(max(0.0, next_ready - time.monotonic()))
+                continue
+            
+            timeout = max(0.0, next_ready - time.monotonic()) if next_ready is not None else None
+            done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+            
+            for future in done:
+                idx = in_flight.pop(future)
+                label = query_labels.get(idx, f"Search {idx}")
+                result = future.result()
                 
-                try:
-                    cleaned_content = clean_json_response(content)
-                    data = json.loads(cleaned_content)
-                    articles = data.get('articles', [])
-                    
-                    valid_articles = 0
-                    for article in articles:
-                        if article.get('title') and article.get('url'):
-                            article['title'] = clean_text_for_json(article.get('title', ''))
-                            all_articles.append(article)
-                            valid_articles += 1
-                    
-                    print(f"   ✓ Found {valid_articles} articles")
-                    
-                except json.JSONDecodeError as e:
-                    print(f"   ❌ Failed to parse JSON response: {str(e)[:100]}")
-                    try:
-                        import re
-                        url_pattern = r'"url"\s*:\s*"([^"]+)"'
-                        title_pattern = r'"title"\s*:\s*"([^"]+)"'
-                        
-                        urls = re.findall(url_pattern, content)
-                        titles = re.findall(title_pattern, content)
-                        
-                        if urls and titles:
-                            valid_articles = 0
-                            for url, title in zip(urls[:250], titles[:250]):
-                                if url and title:
-                                    all_articles.append({
-                                        'url': url,
-                                        'title': clean_text_for_json(title)
-                                    })
-                                    valid_articles += 1
-                            print(f"   ✓ Recovered {valid_articles} articles using fallback parsing")
-                        else:
-                            print(f"   ❌ Could not recover articles from response")
-                    except Exception as e2:
-                        print(f"   ❌ Fallback parsing also failed: {str(e2)[:50]}")
-                    
-            elif response.status_code == 429:
-                print(f"   ⚠️ Rate limited, waiting 2 seconds...")
-                time.sleep(2)
-            else:
-                print(f"   ❌ Error {response.status_code}")
+                if result['status'] == 'retry':
+                    requeue_counts[idx] = requeue_counts.get(idx, 0) + 1
+                    if requeue_counts[idx] <= GDELT_MAX_REQUEUES:
+                        delay = result['retry_after']
+                        if result.get('throttled'):
+                            pause_rate_limit(GDELT_RATE_LIMITER, delay)
+                        print(f"   🔁 {label}: requeued in {delay:.0f}s (attempt {requeue_counts[idx] + 1}/{GDELT_MAX_REQUEUES + 1})")
+                        pending.append((time.monotonic() + delay, idx))
+                        continue
+                    print(f"   ❌ {label}: giving up after {GDELT_MAX_REQUEUES + 1} attempts")
                 
-            time.sleep(2)
-            
-        except requests.exceptions.Timeout:
-            print(f"   ❌ Request timed out")
-        except requests.exceptions.RequestException as e:
-            print(f"   ❌ Request error: {str(e)[:100]}")
-        except Exception as e:
-            print(f"   ❌ Unexpected error: {str(e)[:100]}")
+                query = search_queries[idx - 1]
+                if result['status'] == 'ok' or query in watermarks:
+                    result['articles'] = merge_gdelt_candidates(gdelt_state, query, result['articles'], window_start)
+                if result['status'] == 'ok':
+                    gdelt_state[query]['refreshed_at'] = result['fetched_at']
+                results[idx] = result
+    
+    save_gdelt_state(gdelt_state)
+    
+    for idx in range(1, len(search_queries) + 1):
+        all_articles.extend(results[idx]['articles'])
+    
+    rejected_total = sum(result.get('rejected', 0) for result in results.values())
+    print(f"\n🚫 Skipped {rejected_total:,} articles from unapproved sources while parsing")
+    
+    failed_labels = [query_labels.get(idx, f"Search {idx}") for idx in sorted(results)
+                     if results[idx]['status'] != 'ok']
+    if failed_labels:
+        print(f"\n⚠️ {len(failed_labels)} categories could not be refreshed: {', '.join(failed_labels)}")
     
     return all_articles
 
-def extract_base_domain(url):
-    """Extract base domain from URL, handling subdomains properly"""
+def load_gdelt_state():
+    """Load per-query watermarks and the rolling candidate store"""
+    try:
+        if os.path.exists(GDELT_STATE_FILE):
+            with open(GDELT_STATE_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Could not read GDELT state, starting fresh: {str(e)[:50]}")
+    return {}
+
+def save_gdelt_state(gdelt_state):
+    """Persist per-query watermarks and the rolling candidate store"""
+    try:
+        os.makedirs(os.path.dirname(GDELT_STATE_FILE), exist_ok=True)
+        tmp_path = GDELT_STATE_FILE + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(gdelt_state, f, ensure_ascii=False)
+        os.replace(tmp_path, GDELT_STATE_FILE)
+    except OSError as e:
+        print(f"⚠️ Could not save GDELT state: {str(e)[:50]}")
+
+def merge_gdelt_candidates(gdelt_state, query, new_articles, window_start):
+    """Merge a query's new articles into its rolling store and advance its watermark"""
+    fetched_at = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    entry = gdelt_state.setdefault(query, {'watermark': None, 'articles': []})
+    
+    candidates = {}
+    for article in entry['articles'] + new_articles:
+        if not article.get('seendate'):
+            article['seendate'] = fetched_at
+        candidates[article['url']] = article
+    
+    window_floor = window_start.strftime('%Y%m%dT%H%M%SZ')
+    kept = [article for article in candidates.values() if article['seendate'] >= window_floor]
+    
+    entry['articles'] = kept
+    if kept:
+        entry['watermark'] = max(article['seendate'] for article in kept)
+    
+    return kept
+
+def fetch_gdelt_query(query, label, headers, watermark=None):
+    """Fetch a single GDELT query, reporting whether it should be requeued"""
+    params = {
+        "query": query,
+        "mode": "ArtList",
+        "format": "json",
+        "maxrecords": "250",
+        "sort": "hybridrel"
+    }
+    
+    if watermark:
+        # Only ask for what arrived since the last run; end is floored to the
+        # minute so retries within a run share a cache key.
+        params["startdatetime"] = watermark.strftime('%Y%m%d%H%M%S')
+        params["enddatetime"] = datetime.now(timezone.utc).strftime('%Y%m%d%H%M00')
+    else:
+        params["timespan"] = "1d"
+    
+    result = {'status': 'failed', 'articles': [], 'rejected': 0, 'retry_after': 0, 'throttled': False,
+              'fetched_at': time.time()}
+    
+    cache_key = make_cache_key(GDELT_API_URL, params)
+    cache_file = open_disk_cache(GDELT_CACHE_DIR, cache_key, GDELT_CACHE_TTL_SECONDS)
+    if cache_file is not None:
+        with cache_file:
+            result['fetched_at'] = os.fstat(cache_file.fileno()).st_mtime
+            parsed = parse_gdelt_stream(iter(lambda: cache_file.read(GDELT_STREAM_CHUNK_SIZE), ''), f"{label} (cached)")
+        if parsed is not None:
+            result['status'] = 'ok'
+            result['articles'], result['rejected'] = parsed
+            return result
+    
+    acquire_rate_limit(GDELT_RATE_LIMITER)
+    
     try:
-        if url.startswith('http://'):
-            domain = url[7:].split('/')[0]
-        elif url.startswith('https://'):
-            domain = url[8:].split('/')[0]
+        with get_http_session().get(
+            GDELT_API_URL,
+            params=params,
+            headers=headers,
+            timeout=(HTTP_CONNECT_TIMEOUT, GDELT_READ_TIMEOUT),
+            stream=True
+        ) as response:
+            if response.status_code == 200:
+                chunks = iter_decoded_chunks(response.iter_content(chunk_size=GDELT_STREAM_CHUNK_SIZE))
+                parsed = parse_gdelt_stream(tee_to_disk_cache(chunks, GDELT_CACHE_DIR, cache_key), label)
+                if parsed is not None:
+                    result['status'] = 'ok'
+                    result['articles'], result['rejected'] = parsed
+                return result
+            
+            retry_after_header = response.headers.get('Retry-After')
+        
+        if response.status_code == 429:
+            retry_after = parse_retry_after(retry_after_header, GDELT_DEFAULT_RETRY_AFTER)
+            result['status'] = 'retry'
+            result['throttled'] = True
+            result['retry_after'] = min(GDELT_MAX_RETRY_AFTER, retry_after)
+            print(f"   ⚠️ {label}: Rate limited (retry after {result['retry_after']:.0f}s)")
+        elif response.status_code >= 500:
+            result['status'] = 'retry'
+            result['retry_after'] = GDELT_DEFAULT_RETRY_AFTER
+            print(f"   ⚠️ {label}: Server error {response.status_code}")
         else:
-            domain = url.split('/')[0]
-        
-        domain = domain.replace('www.', '')
+            print(f"   ❌ {label}: Error {response.status_code}")
         
-        parts = domain.split('.')
-        if len(parts) > 2:
-            if parts[-2] in ['co', 'com', 'net', 'org', 'gov', 'edu', 'ac']:
-                base_domain = '.'.join(parts[-3:])
-            else:
-                base_domain = '.'.join(parts[-2:])
-        else:
-            base_domain = domain
-            
-        return base_domain
+    except requests.exceptions.Timeout:
+        result['status'] = 'retry'
+        result['retry_after'] = GDELT_DEFAULT_RETRY_AFTER
+        print(f"   ❌ {label}: Request timed out")
+    except requests.exceptions.RequestException as e:
+        result['status'] = 'retry'
+        result['retry_after'] = GDELT_DEFAULT_RETRY_AFTER
+        print(f"   ❌ {label}: Request error: {str(e)[:100]}")
     except Exception as e:
-        print(f"   ⚠️ Error extracting domain from {url[:50]}...: {str(e)[:50]}")
+        print(f"   ❌ {label}: Unexpected error: {str(e)[:100]}")
+    
+    return result
+
+def repair_gdelt_article(text):
+    """Best-effort recovery of a malformed ArtList record"""
+    try:
+        return json.loads(clean_json_response(text))
+    except ValueError:
+        pass
+    
+    url_match = re.search(r'"url"\s*:\s*"([^"]+)"', text)
+    title_match = re.search(r'"title"\s*:\s*"([^"]+)"', text)
+    seendate_match = re.search(r'"seendate"\s*:\s*"([^"]+)"', text)
+    if url_match and title_match:
+        return {
+            'url': url_match.group(1),
+            'title': title_match.group(1),
+            'seendate': seendate_match.group(1) if seendate_match else ''
+        }
+    return None
+
+def parse_gdelt_stream(chunks, label):
+    """Stream-parse a GDELT ArtList body, keeping only valid articles from approved sources
+    
+    Returns (articles, rejected_count), or None if the body is not usable.
+    """
+    chunks = iter(chunks)
+    first_chunk = ''
+    for first_chunk in chunks:
+        if first_chunk.strip():
+            break
+    
+    if first_chunk.lstrip().startswith('<'):
+        print(f"   ❌ {label}: Got HTML response, skipping...")
         return None
+    if not first_chunk.lstrip().startswith('{'):
+        # GDELT reports throttling and invalid queries as plain text with a 200
+        print(f"   ❌ {label}: Unexpected non-JSON response: {first_chunk.strip()[:80]!r}")
+        return None
+    
+    body = itertools.chain([first_chunk], chunks)
+    valid_articles = []
+    rejected = 0
+    
+    for article in iter_json_array_objects(body, 'articles', repair=repair_gdelt_article):
+        article_url = article.get('url')
+        title = article.get('title')
+        if not article_url or not title:
+            continue
+        
+        if match_allowed_domain(extract_host(article_url)) is None:
+            rejected += 1
+            continue
+        
+        valid_articles.append({
+            'url': article_url,
+            'title': clean_text_for_json(title),
+            'seendate': article.get('seendate', '')
+        })
+    
+    for _ in body:
+        pass
+    
+    print(f"   ✓ {label}: Found {len(valid_articles)} articles ({rejected} from unapproved sources skipped)")
+    return valid_articles, rejected
+
+# ==================== DOMAIN MATCHING ====================
+# Two-label public suffixes, so "telegraph.co.uk" is not reduced to "co.uk"
+MULTI_LABEL_PUBLIC_SUFFIXES = {
+    'co.uk', 'org.uk', 'ac.uk', 'gov.uk', 'com.au', 'net.au', 'org.au', 'gov.au',
+    'co.nz', 'org.nz', 'co.jp', 'or.jp', 'ne.jp', 'co.kr', 'or.kr', 'co.za', 'org.za',
+    'co.in', 'com.ar', 'com.br', 'com.cn', 'com.hk', 'com.sg', 'com.tw', 'com.mx',
+    'com.tr', 'com.my', 'com.ph', 'com.pk', 'co.il', 'co.id', 'com.ng', 'com.eg'
+}
+
+def build_domain_trie(domains):
+    """Build a reversed-label trie, e.g. reuters.com -> {'com': {'reuters': {'$': 'reuters.com'}}}"""
+    trie = {}
+    for domain in domains:
+        node = trie
+        for label in reversed(domain.lower().split('.')):
+            node = node.setdefault(label, {})
+        node['$'] = domain
+    return trie
+
+ALLOWED_DOMAINS_TRIE = build_domain_trie(ALLOWED_DOMAINS)
+
+def extract_host(url):
+    """Return the lower-cased host of a URL without credentials, port or a leading www."""
+    start = url.find('://')
+    start = start + 3 if start >= 0 else 0
+    end = len(url)
+    for separator in '/?#':
+        index = url.find(separator, start)
+        if 0 <= index < end:
+            end = index
+    
+    host = url[start:end].rsplit('@', 1)[-1].split(':', 1)[0].lower().rstrip('.')
+    if host.startswith('www.'):
+        host = host[4:]
+    return host
+
+@functools.lru_cache(maxsize=8192)
+def match_allowed_domain(host):
+    """Return the most specific ALLOWED_DOMAINS entry that host equals or is a subdomain of"""
+    node = ALLOWED_DOMAINS_TRIE
+    match = None
+    for label in reversed(host.split('.')):
+        node = node.get(label)
+        if node is None:
+            break
+        match = node.get('$', match)
+    return match
+
+def match_allowed_domains(urls):
+    """Match a whole candidate list at once, returning (allowed_domain or None, host) per URL"""
+    return [(match_allowed_domain(host), host) for host in map(extract_host, urls)]
+
+def registrable_domain(host):
+    """Reduce a host to its registrable domain using MULTI_LABEL_PUBLIC_SUFFIXES"""
+    parts = host.split('.')
+    if len(parts) > 2 and '.'.join(parts[-2:]) in MULTI_LABEL_PUBLIC_SUFFIXES:
+        return '.'.join(parts[-3:])
+    return '.'.join(parts[-2:])
 
 def deduplicate_articles(articles):
     """Remove duplicate articles based on URL and filter by approved domains"""
@@ -581,25 +1397,28 @@ def deduplicate_articles(articles):
     rejected_domains = set()
     subdomain_matches = 0
     
-    for article in articles:
-        url = article.get('url', '').lower()
-        if url and url not in seen_urls:
-            base_domain = extract_base_domain(url)
-            
-            if base_domain:
-                if base_domain in ALLOWED_DOMAINS_SET:
-                    seen_urls.add(url)
-                    article['domain'] = base_domain
-                    unique_articles.append(article)
-                    approved_count += 1
-                    
-                    if '.' in url.split('/')[2].replace('www.', '').replace(base_domain, ''):
-                        subdomain_matches += 1
-                else:
-                    rejected_count += 1
-                    rejected_domains.add(base_domain)
+    first_by_url = {}
+    urls = [article.get('url', '').lower() for article in articles]
+    
+    for article, url, (allowed_domain, host) in zip(articles, urls, match_allowed_domains(urls)):
+        if url in first_by_url:
+            # The same story was returned by several category queries
+            first_by_url[url]['query_hits'] += 1
+        elif url and url not in seen_urls:
+            if allowed_domain:
+                seen_urls.add(url)
+                first_by_url[url] = article
+                article['domain'] = allowed_domain
+                article['query_hits'] = 1
+                unique_articles.append(article)
+                approved_count += 1
+                
+                if host != allowed_domain:
+                    subdomain_matches += 1
             else:
                 rejected_count += 1
+                if host:
+                    rejected_domains.add(registrable_domain(host))
     
     print(f"- Total articles fetched: {len(articles):,}")
     print(f"- Articles from approved sources: {approved_count:,}")
@@ -613,6 +1432,138 @@ def deduplicate_articles(articles):
     
     return unique_articles
 
+# ==================== PROMPT PACKING ====================
+def estimate_tokens(text):
+    """Cheap local token estimate, good enough for sizing batches"""
+    return int(len(prompt_text(text)) / PROMPT_CHARS_PER_TOKEN) + 1
+
+def prompt_text(prompt):
+    """Full text of a prompt given either as a string or as a (prefix, suffix) pair"""
+    return prompt if isinstance(prompt, str) else ''.join(prompt)
+
+def prompt_content(prompt):
+    """Message content for a prompt; a (prefix, suffix) pair marks the prefix for prompt caching"""
+    if isinstance(prompt, str):
+        return prompt
+    prefix, suffix = prompt
+    blocks = [{"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}}]
+    if suffix:
+        blocks.append({"type": "text", "text": suffix})
+    return blocks
+
+def format_article_row(article):
+    """Encode a candidate as one compact id|domain|title prompt row"""
+    title = clean_text_for_json(article.get('title', '')).replace('|', '/')
+    return f"{article['candidate_id']}|{article.get('domain', '')}|{title}"
+
+def format_article_rows(articles):
+    """Encode candidates as a compact table, one row per line"""
+    return '\n'.join(format_article_row(article) for article in articles)
+
+def format_previous_titles(titles):
+    """List previously published titles one per line instead of as indented JSON"""
+    return '\n'.join(f"- {title}" for title in titles)
+
+def pack_prompt_batches(groups, base_tokens, max_rows, first_batch_scale=1.0):
+    """Fill batches with groups of candidates up to PROMPT_TOKEN_BUDGET and max_rows
+    
+    base_tokens is the cost of the prompt without any rows. A group (e.g. a
+    duplicate cluster) is kept in one batch unless it alone exceeds a batch,
+    in which case it is split into consecutive full-batch chunks.
+    first_batch_scale < 1 shrinks the first batch to shift every later boundary.
+    """
+    batches = [[]]
+    used = base_tokens
+    budget = base_tokens + (PROMPT_TOKEN_BUDGET - base_tokens) * first_batch_scale
+    row_limit = max(1, int(max_rows * first_batch_scale))
+    chunks = (chunk for group in groups for chunk in split_oversized_group(group, base_tokens, max_rows))
+    for group in chunks:
+        group_tokens = sum(estimate_tokens(format_article_row(article)) + 1 for article in group)
+        if batches[-1] and (used + group_tokens > budget or len(batches[-1]) + len(group) > row_limit):
+            batches.append([])
+            used = base_tokens
+            budget = PROMPT_TOKEN_BUDGET
+            row_limit = max_rows
+        batches[-1].extend(group)
+        used += group_tokens
+    return batches
+
+def split_oversized_group(group, base_tokens, max_rows):
+    """Cut a group bigger than one batch into consecutive chunks that each fit a batch"""
+    chunks = [[]]
+    used = base_tokens
+    for article in group:
+        row_tokens = estimate_tokens(format_article_row(article)) + 1
+        if chunks[-1] and (used + row_tokens > PROMPT_TOKEN_BUDGET or len(chunks[-1]) >= max_rows):
+            chunks.append([])
+            used = base_tokens
+        chunks[-1].append(article)
+        used += row_tokens
+    return chunks
+
+# ==================== LOCAL PRE-RANKING ====================
+def source_tier_score(domain):
+    """Score an approved source by its PRERANK_SOURCE_TIERS tier"""
+    for tier, domains in PRERANK_SOURCE_TIERS.items():
+        if domain in domains:
+            return PRERANK_TIER_SCORES[tier]
+    return PRERANK_TIER_SCORES[max(PRERANK_TIER_SCORES)]
+
+def prerank_articles(articles):
+    """Score candidates locally and keep the best PRERANK_TOP_K_PER_CATEGORY per category
+    
+    Signals are query hits, source tier, recency and headline keywords, combined
+    with PRERANK_WEIGHTS. Survivors are returned best first.
+    """
+    if not articles:
+        return articles
+    
+    df = pd.DataFrame({
+        'hits': [article.get('query_hits', 1) for article in articles],
+        'domain': [article.get('domain', '') for article in articles],
+        'seendate': [article.get('seendate', '') for article in articles],
+        'title': [article.get('title', '') for article in articles],
+        'category': [detect_article_category(article) for article in articles]
+    })
+    
+    hits_score = np.log1p(df['hits']) / np.log1p(max(int(df['hits'].max()), 1))
+    
+    tier_score = df['domain'].map({domain: source_tier_score(domain) for domain in df['domain'].unique()})
+    
+    health_score = df['domain'].map(domain_health_scores(df['domain'].unique()))
+    
+    seen_at = pd.to_datetime(df['seendate'], format='%Y%m%dT%H%M%SZ', utc=True, errors='coerce')
+    age_hours = (pd.Timestamp.now(tz='UTC') - seen_at).dt.total_seconds() / 3600
+    recency_score = (1 - age_hours.fillna(GDELT_WINDOW_HOURS) / GDELT_WINDOW_HOURS).clip(0, 1)
+    
+    title_words = df['title'].str.lower().str.findall(r'[a-z]+').explode()
+    keyword_score = (title_words.map(PRERANK_KEYWORD_WEIGHTS).fillna(0)
+                     .groupby(level=0).sum()
+                     .reindex(df.index, fill_value=0)
+                     .clip(upper=1))
+    
+    df['score'] = (PRERANK_WEIGHTS['query_hits'] * hits_score +
+                   PRERANK_WEIGHTS['source_tier'] * tier_score +
+                   PRERANK_WEIGHTS['recency'] * recency_score +
+                   PRERANK_WEIGHTS['keywords'] * keyword_score +
+                   PRERANK_WEIGHTS['scrape_health'] * health_score)
+    
+    category_rank = df.groupby('category')['score'].rank(method='first', ascending=False)
+    kept = df[category_rank <= PRERANK_TOP_K_PER_CATEGORY].sort_values('score', ascending=False, kind='stable')
+    
+    ranked_articles = []
+    for idx, score in kept['score'].items():
+        article = articles[idx]
+        article['prerank_score'] = round(float(score), 4)
+        ranked_articles.append(article)
+    
+    print(f"\n📈 Local pre-ranking: kept {len(ranked_articles)} of {len(articles)} articles "
+          f"(top {PRERANK_TOP_K_PER_CATEGORY} per category)")
+    for category, count in kept['category'].value_counts().items():
+        print(f"   - {category}: {count}")
+    
+    return ranked_articles
+
 def detect_article_category(article):
     """Simple category detection based on URL and domain"""
     url = article.get('url', '').lower()
@@ -652,16 +1603,13 @@ def detect_article_category(article):
     return 'General News'
 
 def create_selection_prompt(articles, previous_articles=None):
-    """Create prompt for Claude to select top 10 most important news stories"""
-    
-    formatted_articles = []
-    for i, article in enumerate(articles):
-        formatted_articles.append({
-            "id": i,
-            "title": clean_text_for_json(article.get('title', '')),
-            "url": article.get('url', ''),
-            "domain": article.get('domain', '')
-        })
+    """Create prompt for Claude to select top 10 most important news stories
+    
+    Returned as a (prefix, suffix) pair: the instructions and previous-article
+    list are identical for every batch in a run and get cached server-side.
+    """
+    
+    register_candidates(articles)
     
     previous_context = ""
     if previous_articles:
@@ -679,8 +1627,8 @@ These articles were already published in recent digests. Do NOT select stories t
 2. Minor updates to these stories (unless major new development)
 3. Similar announcements from the same companies/countries
 
-Previous articles:
-{json.dumps(previous_titles, indent=2)}
+Previous articles (one per line):
+{format_previous_titles(previous_titles)}
 
 Rule: If a story is a continuation of something above, it must have MAJOR new developments to be selected.
 For example:
@@ -689,7 +1637,7 @@ For example:
 - But DO select if it's a major escalation: "Country Y declares war on Country Z"
 """
     
-    prompt = f"""You are an expert global news curator selecting exactly 10 stories from the provided list for a worldwide audience. Your mission: pick only the most significant, high-impact events that shape the world.
+    prefix = f"""You are an expert global news curator selecting exactly 10 stories from the provided list for a worldwide audience. Your mission: pick only the most significant, high-impact events that shape the world.
 
 {previous_context}
 
@@ -738,15 +1686,13 @@ Immediately reject stories that are:
 
 Final Rule: Select exactly 10 stories that clear all filters and maximize global importance + novelty.
 
-IMPORTANT: Return ONLY valid JSON with the 10 selected articles.
+IMPORTANT: Return ONLY valid JSON with the 10 selected articles. Copy each article's "id" exactly as given.
 
 Return this EXACT structure:
 {{
   "selected_articles": [
     {{
       "id": 0,
-      "title": "exact title here",
-      "url": "exact url here",
       "category": "General News/Business News/Science and Technology News",
       "selection_reason": "Brief reason why this was selected (1-2 sentences)",
       "is_update": false,
@@ -757,10 +1703,12 @@ Return this EXACT structure:
 
 You must select EXACTLY 10 articles. Include the category for each based on its content.
 
-ARTICLES TO EVALUATE ({len(formatted_articles)} total):
-{json.dumps(formatted_articles, indent=2)}"""
+"""
     
-    return prompt
+    suffix = f"""ARTICLES TO EVALUATE ({len(articles)} total, one per line as id|domain|title):
+{format_article_rows(articles)}"""
+    
+    return prefix, suffix
 
 def select_top_articles_with_ai(articles, previous_articles=None):
     """Use Claude AI to select the top 10 most important articles"""
@@ -771,95 +1719,284 @@ def select_top_articles_with_ai(articles, previous_articles=None):
     
     print(f"📋 Evaluating {len(articles)} articles for global impact and relevance...")
     
-    if len(articles) > 150:
-        print(f"📦 Large article set detected. Processing in stages...")
+    registry = register_candidates(articles)
+    candidates = articles
+    winners = None
+    level = 1
+    
+    base_tokens = estimate_tokens(create_selection_prompt([], previous_articles))
+    
+    # Tournament: reduce in bounded batches, level by level, until one prompt can hold the rest
+    while True:
+        batches = pack_prompt_batches([[article] for article in candidates], base_tokens, SELECTION_FAN_IN)
+        if len(batches) == 1:
+            break
         
-        batch_size = 100
-        stage1_selected = []
+        # Even out the batches so the last one is not a small remainder
+        balanced_rows = -(-len(candidates) // len(batches))
+        batches = pack_prompt_batches([[article] for article in candidates], base_tokens,
+                                      min(SELECTION_FAN_IN, balanced_rows))
         
-        for i in range(0, len(articles), batch_size):
-            batch = articles[i:i + batch_size]
-            batch_num = i//batch_size + 1
-            total_batches = (len(articles) + batch_size - 1) // batch_size
-            
-            print(f"\n🔍 Stage 1 - Batch {batch_num}/{total_batches}: Evaluating {len(batch)} articles")
-            
-            selection_prompt = create_selection_prompt(batch, previous_articles)
-            response = call_claude_api_with_model(
-                selection_prompt, 
-                f"Selecting top articles from batch {batch_num}",
-                CLAUDE_MODEL
-            )
-            
-            if response:
-                parsed = parse_json_with_fallback(response)
-                if parsed and 'selected_articles' in parsed:
-                    stage1_selected.extend(parsed['selected_articles'])
-                    print(f"   ✅ Selected {len(parsed['selected_articles'])} articles from this batch")
-                else:
-                    print(f"   ⚠️ Failed to parse selection for batch {batch_num}")
-            else:
-                print(f"   ⚠️ Failed to get AI selection for batch {batch_num}")
-            
-            if batch_num < total_batches:
-                time.sleep(2)
+        print(f"\n🏆 Tournament level {level}: {len(candidates)} candidates in {len(batches)} batches "
+              f"of up to {max(len(batch) for batch in batches)} ({min(SELECTION_MAX_WORKERS, len(batches))} in parallel)")
         
-        if len(stage1_selected) > 10:
-            print(f"\n🎯 Stage 2 - Final selection: Choosing top 10 from {len(stage1_selected)} candidates")
-            
-            final_candidates = []
-            for selected in stage1_selected:
-                for orig in articles:
-                    if orig.get('title') == selected.get('title'):
-                        final_candidates.append(orig)
-                        break
-            
-            final_prompt = create_selection_prompt(final_candidates, previous_articles)
-            final_response = call_claude_api_with_model(
-                final_prompt,
-                "Making final selection of top 10 articles",
-                CLAUDE_MODEL
+        if CLAUDE_BATCH_MODE:
+            responses = run_claude_batch(
+                [(create_selection_prompt(batch, previous_articles), CLAUDE_MODEL) for batch in batches],
+                f"Selecting top articles from level {level}",
+                validate=expects_json_keys('selected_articles')
             )
+            batch_results = [parse_selection_response(response, batch_num)
+                             for batch_num, response in enumerate(responses, 1)]
+        else:
+            with ThreadPoolExecutor(max_workers=SELECTION_MAX_WORKERS) as executor:
+                batch_results = list(executor.map(
+                    select_from_batch,
+                    batches,
+                    range(1, len(batches) + 1),
+                    itertools.repeat(len(batches)),
+                    itertools.repeat(previous_articles),
+                    itertools.repeat(level)
+                ))
+        
+        winners = resolve_selected_candidates(
+            [item for result in batch_results for item in result],
+            registry
+        )
+        next_candidates = winners
+        
+        if not next_candidates:
+            print(f"   ⚠️ Tournament level {level} produced no candidates")
+            return None
+        if len(next_candidates) >= len(candidates):
+            # The pool would not fit in one prompt, so keep this level's picks as-is
+            print(f"   ⚠️ Tournament level {level} did not reduce the candidate pool, keeping its top 10")
+            return winners[:10]
+        
+        candidates = next_candidates
+        level += 1
+    
+    if winners is not None:
+        if len(candidates) <= 10:
+            return winners
+        print(f"\n🎯 Final selection: Choosing top 10 from {len(candidates)} candidates")
+    
+    selection_prompt = create_selection_prompt(candidates, previous_articles)
+    response = call_claude_api_with_model(
+        selection_prompt,
+        "Selecting top 10 most important global news stories",
+        CLAUDE_MODEL,
+        validate=expects_json_keys('selected_articles')
+    )
+    
+    if response:
+        parsed = parse_json_with_fallback(response)
+        if parsed and 'selected_articles' in parsed:
+            selected = resolve_selected_candidates(parsed['selected_articles'], registry)
+            print(f"✅ AI selected {len(selected)} top stories")
             
-            if final_response:
-                parsed = parse_json_with_fallback(final_response)
-                if parsed and 'selected_articles' in parsed:
-                    return parsed['selected_articles']
+            print("\n📌 Selection Overview:")
+            for i, article in enumerate(selected[:3], 1):
+                title_preview = article['title'][:60]
+                if len(article['title']) > 60:
+                    title_preview += "..."
+                print(f"  {i}. {title_preview}")
+                print(f"     Reason: {article.get('selection_reason', 'High global impact')}")
+                if article.get('is_update'):
+                    print(f"     Update: {article.get('previous_context', 'Continues previous story')}")
             
-            return stage1_selected[:10]
+            return selected
+    
+    if winners:
+        return winners[:10]
+    
+    return None
+
+def register_candidates(articles):
+    """Give each candidate a stable global 'candidate_id' and return the ID -> article registry
+    
+    IDs already assigned earlier in the run are kept, so the same story has the
+    same ID in every dedup and selection prompt.
+    """
+    registry = {}
+    unassigned = []
+    for article in articles:
+        if 'candidate_id' in article:
+            registry[article['candidate_id']] = article
         else:
-            return stage1_selected
+            unassigned.append(article)
     
-    else:
-        selection_prompt = create_selection_prompt(articles, previous_articles)
-        response = call_claude_api_with_model(
-            selection_prompt,
-            "Selecting top 10 most important global news stories",
-            CLAUDE_MODEL
-        )
-        
-        if response:
-            parsed = parse_json_with_fallback(response)
-            if parsed and 'selected_articles' in parsed:
-                selected = parsed['selected_articles']
-                print(f"✅ AI selected {len(selected)} top stories")
-                
-                print("\n📌 Selection Overview:")
-                for i, article in enumerate(selected[:3], 1):
-                    title_preview = article['title'][:60]
-                    if len(article['title']) > 60:
-                        title_preview += "..."
-                    print(f"  {i}. {title_preview}")
-                    print(f"     Reason: {article.get('selection_reason', 'High global impact')}")
-                    if article.get('is_update'):
-                        print(f"     Update: {article.get('previous_context', 'Continues previous story')}")
-                
-                return selected
-        
+    next_id = max(registry, default=-1) + 1
+    for article in unassigned:
+        article['candidate_id'] = next_id
+        registry[next_id] = article
+        next_id += 1
+    
+    return registry
+
+def parse_candidate_id(value):
+    """Normalise an ID echoed back by the model (int, "17" or "#17") to an int"""
+    if isinstance(value, int):
+        return value
+    try:
+        return int(str(value).strip().lstrip('#'))
+    except (TypeError, ValueError):
         return None
 
-def scrape_article_content(url):
-    """Scrape full article content from URL with improved error handling"""
+def resolve_selected_candidates(selected, registry):
+    """Map selection responses back to full candidate records by ID
+    
+    Each result is the original record (exact title and URL) merged with the
+    model's category, reason and update fields. Unknown or repeated IDs are dropped.
+    """
+    resolved = []
+    seen_ids = set()
+    for item in selected:
+        candidate_id = parse_candidate_id(item.get('id'))
+        if candidate_id not in registry or candidate_id in seen_ids:
+            continue
+        seen_ids.add(candidate_id)
+        
+        record = dict(registry[candidate_id])
+        for field in ('category', 'selection_reason', 'is_update', 'previous_context'):
+            if field in item:
+                record[field] = item[field]
+        resolved.append(record)
+    
+    return resolved
+
+def select_from_batch(batch, batch_num, total_batches, previous_articles=None, level=1):
+    """Run one tournament selection prompt, returning the selected articles (empty on failure)"""
+    print(f"\n🔍 Level {level} - Batch {batch_num}/{total_batches}: Evaluating {len(batch)} articles")
+    
+    selection_prompt = create_selection_prompt(batch, previous_articles)
+    response = call_claude_api_with_model(
+        selection_prompt,
+        f"Selecting top articles from level {level} batch {batch_num}",
+        CLAUDE_MODEL,
+        validate=expects_json_keys('selected_articles')
+    )
+    return parse_selection_response(response, batch_num)
+
+def parse_selection_response(response, batch_num):
+    """Extract the selected articles from one batch selection response (empty on failure)"""
+    if response:
+        parsed = parse_json_with_fallback(response)
+        if parsed and 'selected_articles' in parsed:
+            print(f"   ✅ Selected {len(parsed['selected_articles'])} articles from batch {batch_num}")
+            return parsed['selected_articles']
+        print(f"   ⚠️ Failed to parse selection for batch {batch_num}")
+    else:
+        print(f"   ⚠️ Failed to get AI selection for batch {batch_num}")
+    
+    return []
+
+# Script, style and noscript blocks (and comments) are removed before parsing
+NON_CONTENT_TAGS_PATTERN = re.compile(
+    rb'<(script|style|noscript)\b[^>]*>.*?</\1\s*>|<!--.*?-->',
+    re.IGNORECASE | re.DOTALL
+)
+
+# (CSS selector, XPath equivalent) for likely article containers, best first
+ARTICLE_SELECTORS = [
+    ('article', '//article'),
+    ('[class*="article-body"]', '//*[contains(@class, "article-body")]'),
+    ('[class*="story-body"]', '//*[contains(@class, "story-body")]'),
+    ('[class*="content-body"]', '//*[contains(@class, "content-body")]'),
+    ('[class*="post-content"]', '//*[contains(@class, "post-content")]'),
+    ('[class*="entry-content"]', '//*[contains(@class, "entry-content")]'),
+    ('[class*="article-content"]', '//*[contains(@class, "article-content")]'),
+    ('[class*="story-content"]', '//*[contains(@class, "story-content")]'),
+    ('[class*="main-content"]', '//*[contains(@class, "main-content")]'),
+    ('[itemprop="articleBody"]', '//*[@itemprop="articleBody"]'),
+    ('main', '//main'),
+    ('[role="main"]', '//*[@role="main"]'),
+    ('.content', '//*[contains(concat(" ", normalize-space(@class), " "), " content ")]'),
+    ('#content', '//*[@id="content"]')
+]
+ARTICLE_XPATHS = dict(ARTICLE_SELECTORS)
+
+def extract_article_text(page, preferred_selector=None):
+    """Pull the main article text out of raw page bytes
+    
+    Returns (text, selector) where selector is the CSS selector of the container
+    that held the text, or None if it came from the paragraph fallback.
+    preferred_selector (a learned per-domain rule) is tried before the generic list.
+    
+    Uses lxml's C parser and XPath when lxml is installed, otherwise
+    BeautifulSoup's html.parser with the equivalent CSS selectors. Stops at the
+    first container with real text, or once SCRAPE_MAX_CHARS of paragraphs are in.
+    """
+    if not page.strip():
+        return "", None
+    
+    selectors = ARTICLE_SELECTORS
+    if preferred_selector in ARTICLE_XPATHS:
+        selectors = [(preferred_selector, ARTICLE_XPATHS[preferred_selector])] + \
+                    [entry for entry in ARTICLE_SELECTORS if entry[0] != preferred_selector]
+    
+    if lxml_html is not None:
+        root = lxml_html.fromstring(page)
+        containers = ((css, next(iter(root.xpath(f'({xpath})[1]')), None)) for css, xpath in selectors)
+        paragraphs = root.iter('p')
+        element_text = lxml_element_text
+    else:
+        soup = BeautifulSoup(page, 'html.parser')
+        containers = ((css, soup.select_one(css)) for css, _ in selectors)
+        paragraphs = soup.find_all('p')
+        element_text = soup_element_text
+    
+    article_text = ""
+    for css, content in containers:
+        if content is not None:
+            article_text = element_text(content)
+            if len(article_text) > 200:
+                return re.sub(r'\s+', ' ', article_text).strip(), css
+    
+    if len(article_text) < 200:
+        collected = []
+        length = 0
+        for p in paragraphs:
+            text = element_text(p)
+            if text:
+                collected.append(text)
+                length += len(text) + 1
+                if length >= SCRAPE_MAX_CHARS:
+                    break
+        article_text = ' '.join(collected)
+    
+    return re.sub(r'\s+', ' ', article_text).strip(), None
+
+def lxml_element_text(element):
+    """Text of an lxml element, one space between text nodes"""
+    return ' '.join(text.strip() for text in element.itertext() if text.strip())
+
+def soup_element_text(element):
+    """Text of a BeautifulSoup element, one space between text nodes"""
+    return element.get_text(separator=' ', strip=True)
+
+def read_capped_body(response, max_bytes):
+    """Read a streamed response body, stopping once max_bytes have arrived"""
+    chunks = []
+    received = 0
+    for chunk in response.iter_content(chunk_size=64 * 1024):
+        chunks.append(chunk)
+        received += len(chunk)
+        if received >= max_bytes:
+            break
+    return b''.join(chunks)[:max_bytes]
+
+def scrape_article_content(url, scrape_rules=None, scrape_health=None):
+    """Scrape full article content from URL with improved error handling
+    
+    scrape_rules maps approved domains to the selector that last produced
+    article text there; it is consulted first and updated in place.
+    scrape_health (see load_scrape_health) sets the read timeout from the
+    domain's latency history and receives this attempt's outcome.
+    """
+    domain = match_allowed_domain(extract_host(url)) or extract_host(url)
+    started = time.monotonic()
+    outcome = {'status': 'error', 'chars': 0}
     try:
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
@@ -870,55 +2007,42 @@ def scrape_article_content(url):
             'Upgrade-Insecure-Requests': '1'
         }
         
-        response = requests.get(url, headers=headers, timeout=10, allow_redirects=True)
-        if response.status_code != 200:
-            print(f"   ⚠️ HTTP {response.status_code} for {url[:50]}...")
-            return None
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        for script in soup(["script", "style", "noscript"]):
-            script.decompose()
-        
-        article_text = ""
-        
-        selectors = [
-            'article',
-            '[class*="article-body"]',
-            '[class*="story-body"]',
-            '[class*="content-body"]',
-            '[class*="post-content"]',
-            '[class*="entry-content"]',
-            '[class*="article-content"]',
-            '[class*="story-content"]',
-            '[class*="main-content"]',
-            '[itemprop="articleBody"]',
-            'main',
-            '[role="main"]',
-            '.content',
-            '#content'
-        ]
-        
-        for selector in selectors:
-            content = soup.select_one(selector)
-            if content:
-                article_text = content.get_text(separator=' ', strip=True)
-                if len(article_text) > 200:
-                    break
-        
-        if len(article_text) < 200:
-            paragraphs = soup.find_all('p')
-            article_text = ' '.join([p.get_text(strip=True) for p in paragraphs if p.get_text(strip=True)])
+        read_timeout = SCRAPE_READ_TIMEOUT
+        if scrape_health is not None:
+            read_timeout = domain_read_timeout(scrape_health.get(domain, []))
+        
+        with get_http_session().get(
+            url,
+            headers=headers,
+            timeout=(HTTP_CONNECT_TIMEOUT, read_timeout),
+            allow_redirects=True,
+            stream=True
+        ) as response:
+            outcome['status'] = response.status_code
+            if response.status_code != 200:
+                print(f"   ⚠️ HTTP {response.status_code} for {url[:50]}...")
+                return None
+            page = read_capped_body(response, SCRAPE_MAX_BYTES)
         
-        article_text = re.sub(r'\s+', ' ', article_text)
-        article_text = article_text.strip()
+        rule_domain = domain if scrape_rules is not None and match_allowed_domain(domain) else None
+        article_text, selector = extract_article_text(
+            NON_CONTENT_TAGS_PATTERN.sub(b' ', page),
+            scrape_rules.get(rule_domain) if rule_domain else None
+        )
+        if rule_domain:
+            if selector:
+                scrape_rules[rule_domain] = selector
+            elif scrape_rules.pop(rule_domain, None):
+                print(f"   🔁 Dropped stale extraction rule for {rule_domain}")
         
         if article_text:
-            return article_text[:2000]
+            outcome['chars'] = len(article_text)
+            return article_text[:SCRAPE_MAX_CHARS]
         
         return None
         
     except requests.exceptions.Timeout:
+        outcome['status'] = 'timeout'
         print(f"   ❌ Timeout scraping {url[:50]}...")
         return None
     except requests.exceptions.RequestException as e:
@@ -927,9 +2051,149 @@ def scrape_article_content(url):
     except Exception as e:
         print(f"   ❌ Error scraping {url[:50]}...: {str(e)[:50]}")
         return None
+    finally:
+        if scrape_health is not None and domain:
+            record_scrape_outcome(scrape_health, domain, outcome['status'],
+                                  time.monotonic() - started, outcome['chars'])
+
+def scrape_articles_concurrently(articles):
+    """Scrape the selected articles at once and return {article url: content}
+    
+    Each story starts with its own URL. If it has no text after
+    SCRAPE_HEDGE_DELAY_SECONDS, or its request fails, the next URL from its
+    duplicate cluster is requested alongside, and the first good body wins.
+    At most SCRAPE_PER_HOST_LIMIT requests run against one host. Stories still
+    outstanding at SCRAPE_PHASE_DEADLINE_SECONDS are left out of the result.
+    """
+    deadline = time.monotonic() + SCRAPE_PHASE_DEADLINE_SECONDS
+    scrape_rules = load_scrape_rules()
+    scrape_health = load_scrape_health()
+    host_slots = {}
+    slots_lock = threading.Lock()
+    
+    def scrape(url):
+        host = extract_host(url) or url
+        with slots_lock:
+            slot = host_slots.setdefault(host, threading.Semaphore(SCRAPE_PER_HOST_LIMIT))
+        if not slot.acquire(timeout=max(0, deadline - time.monotonic())):
+            return None
+        try:
+            return scrape_article_content(url, scrape_rules, scrape_health)
+        finally:
+            slot.release()
+    
+    # Healthier alternates go first; domains that keep failing are skipped
+    # unless a recovery probe is due
+    probed = set()
+    skipped = set()
+    
+    def usable(url):
+        domain = match_allowed_domain(extract_host(url)) or extract_host(url)
+        samples = scrape_health.get(domain, [])
+        if not domain_is_skipped(samples):
+            return True
+        if domain not in probed and time.time() - samples[-1]['at'] > SCRAPE_SKIP_PROBE_HOURS * 3600:
+            probed.add(domain)
+            return True
+        skipped.add(domain)
+        return False
+    
+    def health_rank(url):
+        stats = summarize_domain_health(scrape_health.get(match_allowed_domain(extract_host(url)) or extract_host(url), []))
+        return (-stats['success_rate'], stats['p50'])
+    
+    stories = []
+    for article in {article['url']: article for article in articles}.values():
+        alternates = sorted((entry['url'] for entry in article.get('duplicates', [])), key=health_rank)
+        urls = [url for url in dict.fromkeys([article['url']] + alternates) if usable(url)]
+        stories.append({'url': article['url'], 'urls': urls[:SCRAPE_MAX_ALTERNATES + 1],
+                        'next': 0, 'running': 0, 'hedge_at': 0, 'content': None})
+    if skipped:
+        print(f"   ⏭️ Skipping unreliable sources: {', '.join(sorted(skipped))}")
+    
+    executor = ThreadPoolExecutor(max_workers=SCRAPE_MAX_WORKERS)
+    in_flight = {}
+    abandoned = []
+    hedged = 0
+    while time.monotonic() < deadline:
+        now = time.monotonic()
+        for story in stories:
+            if story['content'] is None and story['next'] < len(story['urls']) and \
+                    (story['running'] == 0 or now >= story['hedge_at']):
+                url = story['urls'][story['next']]
+                if story['next'] > 0:
+                    hedged += 1
+                    print(f"   🔀 Trying alternate source for {story['url'][:50]}...: {extract_host(url)}")
+                story['next'] += 1
+                story['running'] += 1
+                story['hedge_at'] = now + SCRAPE_HEDGE_DELAY_SECONDS
+                in_flight[executor.submit(scrape, url)] = (story, url)
+        
+        if not in_flight:
+            break
+        
+        waiting = [story['hedge_at'] for story in stories
+                   if story['content'] is None and story['next'] < len(story['urls'])]
+        wake_at = min(waiting + [deadline])
+        done, _ = wait(in_flight, timeout=max(0, wake_at - time.monotonic()), return_when=FIRST_COMPLETED)
+        
+        for future in done:
+            story, url = in_flight.pop(future)
+            story['running'] -= 1
+            content = future.result()
+            if content and story['content'] is None:
+                story['content'] = content
+                if url != story['url']:
+                    print(f"   ✓ Using {extract_host(url)} for {story['url'][:50]}...")
+                # Losing requests finish in the background; stop waiting on them
+                for other, (other_story, _) in list(in_flight.items()):
+                    if other_story is story:
+                        if not other.cancel():
+                            abandoned.append(other)
+                        del in_flight[other]
+    
+    executor.shutdown(wait=False, cancel_futures=True)
+    
+    # Requests still running record their outcome in scrape health when they
+    # finish; give them one request timeout so slow sources are not forgotten
+    if abandoned or in_flight:
+        wait(abandoned + list(in_flight), timeout=HTTP_CONNECT_TIMEOUT + SCRAPE_READ_TIMEOUT)
+    
+    missing = sum(1 for story in stories if story['content'] is None)
+    if in_flight:
+        print(f"   ⚠️ Scraping deadline reached, {missing} stories still without text")
+    if hedged:
+        print(f"   Hedged {hedged} requests to alternate sources")
+    save_scrape_rules(dict(scrape_rules))
+    with _scrape_health_lock:
+        health_snapshot = {domain: list(samples) for domain, samples in scrape_health.items()}
+    save_scrape_health(health_snapshot)
+    
+    return {story['url']: story['content'] for story in stories if story['content']}
+
+def load_scrape_rules():
+    """Load the learned domain -> article selector rules"""
+    try:
+        if os.path.exists(SCRAPE_RULES_FILE):
+            with open(SCRAPE_RULES_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Could not read extraction rules, starting fresh: {str(e)[:50]}")
+    return {}
+
+def save_scrape_rules(scrape_rules):
+    """Persist the learned domain -> article selector rules"""
+    try:
+        os.makedirs(os.path.dirname(SCRAPE_RULES_FILE), exist_ok=True)
+        tmp_path = SCRAPE_RULES_FILE + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(scrape_rules, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp_path, SCRAPE_RULES_FILE)
+    except OSError as e:
+        print(f"⚠️ Could not save extraction rules: {str(e)[:50]}")
 
 def create_rewriting_prompt(articles_with_content, previous_articles=None):
-    """Create prompt for Claude to rewrite articles in B2 English"""
+    """Create prompt for Claude to rewrite articles in B2 English, as a (prefix, suffix) pair"""
     
     previous_context = ""
     if previous_articles:
@@ -954,7 +2218,7 @@ RULE: If writing about a development of a previous story, start with phrases lik
 - "New information reveals..."
 """
     
-    prompt = f"""You are the senior news editor for Tennews.org. Today is {datetime.now().strftime('%B %d, %Y')}.
+    prefix = f"""You are the senior news editor for Tennews.org. Today is {datetime.now().strftime('%B %d, %Y')}.
 
 {previous_context}
 
@@ -978,7 +2242,6 @@ BODY TEXT RULES:
 Return ONLY valid JSON:
 {{
   "digest_date": "{datetime.now().strftime('%B %d, %Y')}",
-  "generation_time": "{datetime.now().strftime('%I:%M %p UTC')}",
   "articles": [
     {{
       "rank": 1,
@@ -996,9 +2259,9 @@ Return ONLY valid JSON:
   ]
 }}
 
-ARTICLES TO REWRITE:
 """
     
+    prompt = "ARTICLES TO REWRITE:\n"
     for i, article in enumerate(articles_with_content, 1):
         content = clean_text_for_json(article.get('content', 'No content available'))
         if len(content) > 500:
@@ -1017,47 +2280,346 @@ Content: {content}
 
 ---"""
     
-    prompt += "\n\nReturn ONLY the JSON with all 10 rewritten articles. Set importance based on the selection reason."
+    prompt += (f"\n\nReturn ONLY the JSON with all {len(articles_with_content)} rewritten articles. "
+               "Set importance based on the selection reason.")
+    
+    return prefix, prompt
+
+def rewrite_url_key(url):
+    """Compare URLs the way the model tends to echo them (scheme, www. and trailing slash ignored)"""
+    url = (url or '').strip().lower()
+    url = re.sub(r'^https?://', '', url)
+    if url.startswith('www.'):
+        url = url[4:]
+    return url.rstrip('/')
+
+def rewrite_articles(articles_with_content, previous_articles=None):
+    """Rewrite the selected articles, streaming the response
+    
+    Complete article objects are kept even when the stream ends early, and
+    only the articles missing from a truncated response are requested again.
+    Returned objects are matched to the input by URL; anything unknown or
+    already received is dropped, so the digest never grows past the input.
+    """
+    rewritten = []
+    done_keys = set()
+    remaining = articles_with_content
+    for request_num in range(1, REWRITE_MAX_REQUESTS + 1):
+        task = "Rewriting articles in B2 English"
+        if request_num > 1:
+            task = f"Rewriting {len(remaining)} missing articles in B2 English"
+        response = call_claude_api_with_model(
+            create_rewriting_prompt(remaining, previous_articles), task, CLAUDE_MODEL, stream=True,
+            validate=expects_json_keys('articles')
+        )
+        if not response:
+            break
+        
+        received = [article for article in iter_json_array_objects([response], 'articles')
+                    if isinstance(article, dict) and article.get('title')]
+        if not received:
+            parsed = parse_json_with_fallback(response)
+            received = parsed.get('articles', []) if parsed else []
+        
+        originals = {rewrite_url_key(article['url']): article for article in remaining}
+        matched = 0
+        for article in received:
+            key = rewrite_url_key(article.get('url'))
+            if key in originals and key not in done_keys:
+                article['url'] = originals[key]['url']
+                rewritten.append(article)
+                done_keys.add(key)
+                matched += 1
+        
+        if not matched:
+            if request_num == 1 and received:
+                # The model did not echo usable URLs; keep the reply as-is rather than re-requesting
+                print("⚠️ Rewritten articles could not be matched by URL, keeping them without re-requests")
+                rewritten = received[:len(articles_with_content)]
+            break
+        
+        missing = [article for article in remaining if rewrite_url_key(article['url']) not in done_keys]
+        if not missing:
+            break
+        print(f"⚠️ Response covered {matched}/{len(remaining)} articles, requesting the rest")
+        remaining = missing
+    
+    if not rewritten:
+        return None
+    
+    # Re-requested articles keep their selection position rather than going last
+    positions = {rewrite_url_key(article['url']): index for index, article in enumerate(articles_with_content)}
+    rewritten.sort(key=lambda article: positions.get(rewrite_url_key(article.get('url')), len(positions)))
+    rewritten = rewritten[:len(articles_with_content)]
+    for rank, article in enumerate(rewritten, 1):
+        article['rank'] = rank
     
-    return prompt
+    return {
+        'digest_date': datetime.now().strftime('%B %d, %Y'),
+        'articles': rewritten
+    }
+
+# ==================== SCRAPE HEALTH ====================
+_scrape_health_lock = threading.Lock()
+
+def load_scrape_health():
+    """Load recent scrape outcomes per domain ({domain: [outcome, ...]})"""
+    try:
+        if os.path.exists(SCRAPE_HEALTH_FILE):
+            with open(SCRAPE_HEALTH_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Could not read scrape health, starting fresh: {str(e)[:50]}")
+    return {}
+
+def save_scrape_health(scrape_health):
+    """Persist recent scrape outcomes per domain"""
+    try:
+        os.makedirs(os.path.dirname(SCRAPE_HEALTH_FILE), exist_ok=True)
+        tmp_path = SCRAPE_HEALTH_FILE + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(scrape_health, f, ensure_ascii=False, sort_keys=True)
+        os.replace(tmp_path, SCRAPE_HEALTH_FILE)
+    except OSError as e:
+        print(f"⚠️ Could not save scrape health: {str(e)[:50]}")
+
+def record_scrape_outcome(scrape_health, domain, status, seconds, chars):
+    """Append one scrape attempt to the domain's history, keeping SCRAPE_HEALTH_WINDOW entries"""
+    with _scrape_health_lock:
+        samples = scrape_health.setdefault(domain, [])
+        samples.append({'at': round(time.time()), 'status': status,
+                        'seconds': round(seconds, 2), 'chars': chars})
+        del samples[:-SCRAPE_HEALTH_WINDOW]
+
+def summarize_domain_health(samples):
+    """Success rate, p50/p95 latency of successes, median text length and status counts"""
+    successes = [sample for sample in samples if sample['chars'] > 0]
+    latencies = [sample['seconds'] for sample in successes]
+    return {
+        'attempts': len(samples),
+        'success_rate': len(successes) / len(samples) if samples else 1.0,
+        'p50': float(np.percentile(latencies, 50)) if latencies else 0.0,
+        'p95': float(np.percentile(latencies, 95)) if latencies else float(SCRAPE_READ_TIMEOUT),
+        'chars': int(np.median([sample['chars'] for sample in successes])) if successes else 0,
+        'statuses': dict(collections.Counter(str(sample['status']) for sample in samples))
+    }
+
+def domain_is_skipped(samples):
+    """True once a domain has enough history and almost never yields text"""
+    return (len(samples) >= SCRAPE_HEALTH_MIN_SAMPLES and
+            summarize_domain_health(samples)['success_rate'] < SCRAPE_SKIP_SUCCESS_RATE)
+
+def domain_read_timeout(samples):
+    """Read timeout for a domain: 1.5x its p95 success latency, within the configured bounds"""
+    stats = summarize_domain_health(samples)
+    if stats['attempts'] < SCRAPE_HEALTH_MIN_SAMPLES or not stats['p50']:
+        return SCRAPE_READ_TIMEOUT
+    return min(SCRAPE_READ_TIMEOUT, max(SCRAPE_MIN_READ_TIMEOUT, stats['p95'] * 1.5))
+
+def domain_health_scores(domains):
+    """Scrape success rate per domain for pre-ranking (1.0 until enough history exists)"""
+    scrape_health = load_scrape_health()
+    scores = {}
+    for domain in domains:
+        samples = scrape_health.get(domain, [])
+        if len(samples) < SCRAPE_HEALTH_MIN_SAMPLES:
+            scores[domain] = 1.0
+        else:
+            scores[domain] = summarize_domain_health(samples)['success_rate']
+    return scores
+
+# ==================== NEAR-DUPLICATE DETECTION ====================
+TITLE_STOPWORDS = {
+    'a', 'an', 'the', 'and', 'or', 'but', 'of', 'to', 'in', 'on', 'at', 'for', 'by', 'with',
+    'from', 'as', 'is', 'are', 'was', 'were', 'be', 'been', 'has', 'have', 'had', 'it', 'its',
+    'this', 'that', 'after', 'over', 'into', 'about', 'amid', 'says', 'said', 'new', 'will',
+    'up', 'out', 'than', 'more', 'how', 'what', 'why', 'who', 'his', 'her', 'their', 'he', 'she'
+}
+
+MINHASH_PRIME = (1 << 31) - 1
+_minhash_rng = np.random.RandomState(20250827)
+MINHASH_A = _minhash_rng.randint(1, MINHASH_PRIME, size=NEAR_DUP_NUM_PERM).astype(np.int64)
+MINHASH_B = _minhash_rng.randint(0, MINHASH_PRIME, size=NEAR_DUP_NUM_PERM).astype(np.int64)
+
+def title_shingles(title):
+    """Normalise a headline into a set of content words for similarity checks"""
+    title = title.lower()
+    
+    # Drop a trailing outlet name such as " - Reuters" or " | CNN"
+    parts = re.split(r'\s+[|\-–—]\s+', title)
+    if len(parts) > 1 and len(parts[-1].split()) <= 4:
+        title = ' '.join(parts[:-1])
+    
+    shingles = set()
+    for word in re.findall(r'[a-z0-9]+', title):
+        if word in TITLE_STOPWORDS or len(word) < 2:
+            continue
+        if len(word) > 3 and word.endswith('s'):
+            word = word[:-1]
+        shingles.add(word)
+    return shingles
+
+def minhash_signature(shingles):
+    """MinHash signature of a shingle set using NEAR_DUP_NUM_PERM universal hashes"""
+    hashes = np.fromiter(
+        (zlib.crc32(shingle.encode('utf-8')) & 0x7fffffff for shingle in shingles),
+        dtype=np.int64,
+        count=len(shingles)
+    )
+    return ((np.outer(MINHASH_A, hashes) + MINHASH_B[:, None]) % MINHASH_PRIME).min(axis=1)
+
+def merge_duplicate(keeper, duplicate):
+    """Record duplicate (and anything it had absorbed) in keeper's 'duplicates' list
+    
+    The list keeps alternate URLs for the same story, used as scraping fallbacks.
+    """
+    known_urls = {keeper.get('url')} | {entry['url'] for entry in keeper.get('duplicates', [])}
+    entries = [{'url': duplicate.get('url', ''), 'title': duplicate.get('title', ''),
+                'domain': duplicate.get('domain', '')}] + duplicate.get('duplicates', [])
+    for entry in entries:
+        if entry['url'] and entry['url'] not in known_urls:
+            keeper.setdefault('duplicates', []).append(entry)
+            known_urls.add(entry['url'])
+
+def find_root(parents, i):
+    """Union-find lookup with path halving"""
+    while parents[i] != i:
+        parents[i] = parents[parents[i]]
+        i = parents[i]
+    return i
+
+def cluster_near_duplicates(articles):
+    """Collapse obvious near-duplicate headlines locally and flag ambiguous clusters
+    
+    Returns (stories, review_groups). stories keeps one representative per
+    obvious cluster, in input order, with the other members recorded under
+    'duplicates'. review_groups lists the representatives whose similarity
+    is too close to call and should be checked by Claude.
+    """
+    shingle_sets = [title_shingles(article.get('title', '')) for article in articles]
+    rows_per_band = NEAR_DUP_NUM_PERM // NEAR_DUP_BANDS
+    
+    buckets = {}
+    for i, shingles in enumerate(shingle_sets):
+        if not shingles:
+            continue
+        signature = minhash_signature(shingles)
+        for band in range(NEAR_DUP_BANDS):
+            band_key = (band, signature[band * rows_per_band:(band + 1) * rows_per_band].tobytes())
+            buckets.setdefault(band_key, []).append(i)
+    
+    candidate_pairs = set()
+    for members in buckets.values():
+        for a in range(len(members)):
+            for b in range(a + 1, len(members)):
+                candidate_pairs.add((members[a], members[b]))
+    
+    strong_parents = list(range(len(articles)))
+    ambiguous_pairs = []
+    for i, j in candidate_pairs:
+        union_size = len(shingle_sets[i] | shingle_sets[j])
+        similarity = len(shingle_sets[i] & shingle_sets[j]) / union_size
+        if similarity >= NEAR_DUP_AUTO_MERGE_THRESHOLD:
+            root_i, root_j = find_root(strong_parents, i), find_root(strong_parents, j)
+            if root_i != root_j:
+                strong_parents[max(root_i, root_j)] = min(root_i, root_j)
+        elif similarity >= NEAR_DUP_REVIEW_THRESHOLD:
+            ambiguous_pairs.append((i, j))
+    
+    clusters = {}
+    for i in range(len(articles)):
+        clusters.setdefault(find_root(strong_parents, i), []).append(i)
+    
+    stories = []
+    collapsed = 0
+    for root in sorted(clusters):
+        representative = articles[root]
+        members = clusters[root][1:]
+        if members:
+            for m in members:
+                merge_duplicate(representative, articles[m])
+            collapsed += len(members)
+        stories.append(representative)
+    
+    review_parents = {root: root for root in clusters}
+    for i, j in ambiguous_pairs:
+        root_i = find_root(review_parents, find_root(strong_parents, i))
+        root_j = find_root(review_parents, find_root(strong_parents, j))
+        if root_i != root_j:
+            review_parents[max(root_i, root_j)] = min(root_i, root_j)
+    
+    review_clusters = {}
+    for root in sorted(clusters):
+        review_clusters.setdefault(find_root(review_parents, root), []).append(articles[root])
+    review_groups = [group for group in review_clusters.values() if len(group) > 1]
+    
+    print(f"\n🧮 Local near-duplicate pass over {len(articles)} articles:")
+    print(f"   - Obvious duplicates collapsed locally: {collapsed}")
+    print(f"   - Stories remaining: {len(stories)}")
+    print(f"   - Ambiguous clusters for Claude: {len(review_groups)} "
+          f"({sum(len(group) for group in review_groups)} stories)")
+    
+    return stories, review_groups
 
 def deduplicate_with_claude(articles):
-    """Use Claude Sonnet 3.5 to identify and remove duplicate news stories"""
+    """Collapse near-duplicates locally, then use Claude Sonnet 3.5 on the ambiguous clusters only"""
     if not articles:
         return articles
     
-    print(f"\n🤖 Using Claude Sonnet 3.5 to identify duplicate news stories...")
-    print(f"📋 Analyzing {len(articles)} articles for duplicates...")
-    
-    batch_size = 100
-    if len(articles) > batch_size:
-        all_deduplicated = []
-        for i in range(0, len(articles), batch_size):
-            batch = articles[i:i + batch_size]
-            print(f"\n📦 Processing deduplication batch {i//batch_size + 1}/{(len(articles) + batch_size - 1)//batch_size}")
-            
-            deduplicated_batch = process_deduplication_batch(batch)
-            if deduplicated_batch:
-                all_deduplicated.extend(deduplicated_batch)
-            
-            time.sleep(1)
+    register_candidates(articles)
+    stories, review_groups = cluster_near_duplicates(articles)
+    if not review_groups:
+        return stories
+    
+    print(f"\n🤖 Using Claude Sonnet 3.5 to resolve ambiguous duplicate clusters...")
+    print(f"📋 Analyzing {sum(len(group) for group in review_groups)} articles for duplicates...")
+    
+    base_tokens = estimate_tokens(create_deduplication_prompt([]))
+    reviewed_ids = {id(article) for group in review_groups for article in group}
+    groups = review_groups
+    survivors = [article for group in review_groups for article in group]
+    
+    for round_num in range(1, DEDUP_MAX_ROUNDS + 1):
+        # Round 1 keeps each cluster inside one prompt. Later rounds re-check the
+        # survivors with shifted batch boundaries so stories split across
+        # batches in the previous round meet in the same prompt.
+        batches = pack_prompt_batches(groups, base_tokens, DEDUP_MAX_ROWS)
+        if round_num > 1 and len(batches) > 1:
+            batches = pack_prompt_batches(groups, base_tokens, DEDUP_MAX_ROWS, first_batch_scale=0.5)
+        
+        print(f"\n📦 Deduplication round {round_num}: {len(survivors)} articles in {len(batches)} batches "
+              f"({min(DEDUP_MAX_WORKERS, len(batches))} in parallel)")
+        
+        if CLAUDE_BATCH_MODE:
+            responses = run_claude_batch(
+                [(create_deduplication_prompt(batch), CLAUDE_SONNET_MODEL) for batch in batches],
+                f"Identifying duplicate news stories (round {round_num})",
+                validate=expects_json_keys('unique_articles')
+            )
+            batch_results = [apply_deduplication_response(batch, response)
+                             for batch, response in zip(batches, responses)]
+        else:
+            with ThreadPoolExecutor(max_workers=DEDUP_MAX_WORKERS) as executor:
+                batch_results = list(executor.map(process_deduplication_batch, batches))
         
-        return all_deduplicated
-    else:
-        return process_deduplication_batch(articles)
+        kept_ids = {id(article) for result in batch_results for article in (result or [])}
+        round_survivors = [article for article in survivors if id(article) in kept_ids]
+        removed = len(survivors) - len(round_survivors)
+        survivors = round_survivors
+        
+        if len(batches) == 1 or (round_num > 1 and removed == 0):
+            break
+        groups = [[article] for article in survivors]
+    
+    kept_ids = {id(article) for article in survivors}
+    return [story for story in stories if id(story) not in reviewed_ids or id(story) in kept_ids]
 
-def process_deduplication_batch(articles):
-    """Process a single batch of articles for deduplication"""
-    formatted_articles = []
-    for i, article in enumerate(articles):
-        formatted_articles.append({
-            "id": i,
-            "title": clean_text_for_json(article.get('title', '')),
-            "url": article.get('url', ''),
-            "domain": article.get('domain', '')
-        })
+
+def create_deduplication_prompt(articles):
+    """Create prompt for Claude to keep one article per news event, as a (prefix, suffix) pair"""
+    register_candidates(articles)
     
-    prompt = f"""You are a news editor identifying duplicate news stories.
+    prefix = f"""You are a news editor identifying duplicate news stories.
 
 TASK: Group articles about the SAME NEWS EVENT and select the BEST title from each group.
 
@@ -1072,21 +2634,37 @@ Return ONLY valid JSON with this structure:
   "unique_articles": [
     {{
       "id": 0,
+      "duplicate_ids": [3, 8],
       "reason": "Selected because: best title among 3 duplicates about X event"
     }},
     {{
       "id": 5,
+      "duplicate_ids": [],
       "reason": "Unique story - no duplicates found"
     }}
   ]
 }}
 
 IMPORTANT: Return the ID of EVERY article you want to keep (both unique stories and best titles from duplicate groups).
+For each kept article, list the IDs of the articles it replaces in "duplicate_ids".
 
-ARTICLES TO ANALYZE:
-{json.dumps(formatted_articles, indent=2)}"""
+"""
     
-    response = call_claude_api_with_model(prompt, "Identifying duplicate news stories", CLAUDE_SONNET_MODEL)
+    suffix = f"""ARTICLES TO ANALYZE ({len(articles)} total, one per line as id|domain|title):
+{format_article_rows(articles)}"""
+    
+    return prefix, suffix
+
+def process_deduplication_batch(articles):
+    """Process a single batch of articles for deduplication"""
+    prompt = create_deduplication_prompt(articles)
+    response = call_claude_api_with_model(prompt, "Identifying duplicate news stories", CLAUDE_SONNET_MODEL,
+                                          validate=expects_json_keys('unique_articles'))
+    return apply_deduplication_response(articles, response)
+
+def apply_deduplication_response(articles, response):
+    """Keep the articles a deduplication response chose (all of them if the response is unusable)"""
+    registry = register_candidates(articles)
     
     if not response:
         print("⚠️ Deduplication failed, keeping all articles")
@@ -1100,17 +2678,26 @@ ARTICLES TO ANALYZE:
         
         ids_to_keep = set()
         reasons = {}
+        replaced = {}
         for item in parsed_data['unique_articles']:
-            article_id = item.get('id')
-            if article_id is not None:
+            article_id = parse_candidate_id(item.get('id'))
+            if article_id in registry:
                 ids_to_keep.add(article_id)
                 reasons[article_id] = item.get('reason', '')
+                duplicate_ids = item.get('duplicate_ids') or []
+                if isinstance(duplicate_ids, list):
+                    replaced[article_id] = [parse_candidate_id(value) for value in duplicate_ids]
+        
+        for article_id, duplicate_ids in replaced.items():
+            for duplicate_id in duplicate_ids:
+                if duplicate_id in registry and duplicate_id not in ids_to_keep:
+                    merge_duplicate(registry[article_id], registry[duplicate_id])
         
         deduplicated_articles = []
         duplicate_count = 0
         
-        for i, article in enumerate(articles):
-            if i in ids_to_keep:
+        for article in articles:
+            if article['candidate_id'] in ids_to_keep:
                 deduplicated_articles.append(article)
             else:
                 duplicate_count += 1
@@ -1123,13 +2710,12 @@ ARTICLES TO ANALYZE:
         if len(reasons) > 0 and len(deduplicated_articles) > 0:
             print("\n📌 Sample decisions:")
             sample_count = min(3, len(reasons))
-            for i, (aid, reason) in enumerate(list(reasons.items())[:sample_count]):
-                if aid < len(articles):
-                    title_preview = articles[aid]['title'][:60]
-                    if len(articles[aid]['title']) > 60:
-                        title_preview += "..."
-                    print(f"   - Kept: {title_preview}")
-                    print(f"     Reason: {reason}")
+            for aid, reason in list(reasons.items())[:sample_count]:
+                title_preview = registry[aid]['title'][:60]
+                if len(registry[aid]['title']) > 60:
+                    title_preview += "..."
+                print(f"   - Kept: {title_preview}")
+                print(f"     Reason: {reason}")
         
         return deduplicated_articles
         
@@ -1137,49 +2723,154 @@ ARTICLES TO ANALYZE:
         print(f"⚠️ Error in deduplication: {str(e)[:100]}")
         return articles
 
-def call_claude_api_with_model(prompt, task_description, model=None):
-    """Generic Claude API call function with model selection and improved error handling"""
-    if not CLAUDE_API_KEY or CLAUDE_API_KEY == "your-api-key-here-for-testing":
-        print("\n❌ ERROR: No valid API key set!")
-        print("Please set your Claude API key in GitHub Secrets")
-        return None
-    
-    api_model = model if model else CLAUDE_MODEL
-        
-    print(f"\n🤖 {task_description}...")
-    print(f"   Using model: {api_model}")
-    
-    url = "https://api.anthropic.com/v1/messages"
-    
-    headers = {
+def claude_api_headers():
+    """Headers shared by every Messages API request"""
+    return {
         "x-api-key": CLAUDE_API_KEY,
         "anthropic-version": "2023-06-01",
         "content-type": "application/json"
     }
-    
+
+def build_claude_request(prompt, task_description, model=None):
+    """Build the Messages API request body for one prompt"""
     max_tokens = 4000 if "scoring" in task_description.lower() else 8000
     
-    data = {
-        "model": api_model,
+    return {
+        "model": model if model else CLAUDE_MODEL,
         "max_tokens": max_tokens,
         "temperature": 0.1,
         "messages": [{
             "role": "user",
-            "content": prompt
+            "content": prompt_content(prompt)
         }]
     }
+
+def claude_cache_key(data):
+    """Response cache key for a request body (model, prompt and sampling parameters)"""
+    return make_cache_key(data['model'], data['max_tokens'], data['temperature'], data['messages'])
+
+def read_claude_stream(response, deadline):
+    """Assemble the text of a streamed (SSE) Messages API response
+    
+    Returns (text, complete, error_type). complete is False when the stream
+    stalled, dropped, hit max_tokens, sent an error event or ran past
+    deadline; the text received up to that point is still returned.
+    """
+    parts = []
+    stop_reason = None
+    # SSE is always UTF-8; without a charset requests would decode it as ISO-8859-1
+    response.encoding = 'utf-8'
+    try:
+        for line in response.iter_lines(decode_unicode=True):
+            if time.monotonic() > deadline:
+                print(f"⚠️ Stream exceeded {CLAUDE_STREAM_MAX_SECONDS}s, keeping the text received so far")
+                return ''.join(parts), False, None
+            if not line or not line.startswith('data:'):
+                continue
+            
+            event = json.loads(line[5:])
+            event_type = event.get('type')
+            if event_type == 'content_block_delta' and event['delta'].get('type') == 'text_delta':
+                parts.append(event['delta']['text'])
+            elif event_type == 'message_delta':
+                stop_reason = event['delta'].get('stop_reason', stop_reason)
+            elif event_type == 'message_stop':
+                return ''.join(parts), stop_reason != 'max_tokens', None
+            elif event_type == 'error':
+                return ''.join(parts), False, event.get('error', {}).get('type')
+    except requests.exceptions.RequestException as e:
+        # A gap longer than the read timeout surfaces here as a stalled stream
+        print(f"⚠️ Stream interrupted: {str(e)[:100]}")
+    except ValueError:
+        print("⚠️ Malformed stream event")
+    
+    return ''.join(parts), False, None
+
+def call_claude_api_with_model(prompt, task_description, model=None, use_cache=True, stream=False,
+                               validate=None):
+    """Generic Claude API call function with model selection and improved error handling
+    
+    Responses accepted by validate(text) are cached on disk by model, prompt
+    and sampling parameters; without validate nothing is cached. Pass
+    use_cache=False (or set CLAUDE_CACHE_BYPASS=1) to skip the cache.
+    
+    With stream=True the response is streamed: the read timeout applies to the
+    gap between events rather than the whole generation, and if the stream
+    breaks after text has arrived the partial text is returned instead of
+    retrying from scratch. Stream callers must check the text is complete.
+    """
+    if not CLAUDE_API_KEY or CLAUDE_API_KEY == "your-api-key-here-for-testing":
+        print("\n❌ ERROR: No valid API key set!")
+        print("Please set your Claude API key in GitHub Secrets")
+        return None
+    
+    data = build_claude_request(prompt, task_description, model)
+    api_model = data['model']
+        
+    print(f"\n🤖 {task_description}...")
+    print(f"   Using model: {api_model}")
+    
+    url = f"{CLAUDE_API_BASE_URL}/v1/messages"
+    headers = claude_api_headers()
+    
+    use_cache = use_cache and validate is not None and not CLAUDE_CACHE_BYPASS
+    cache_key = claude_cache_key(data)
+    if use_cache:
+        cached_text = read_disk_cache(CLAUDE_CACHE_DIR, cache_key, CLAUDE_CACHE_TTL_SECONDS)
+        if cached_text is not None and validate(cached_text):
+            print(f"💾 {task_description}: using cached response")
+            return cached_text
+    
+    if stream:
+        data['stream'] = True
     
     max_retries = 5
     for attempt in range(max_retries):
         try:
             timeout_seconds = 120 if "scoring" in task_description.lower() else 90
-            response = requests.post(url, headers=headers, json=data, timeout=timeout_seconds)
+            if stream:
+                timeout_seconds = CLAUDE_STREAM_IDLE_TIMEOUT
+            acquire_rate_limit(CLAUDE_RATE_LIMITER)
+            response = get_http_session().post(
+                url,
+                headers=headers,
+                json=data,
+                timeout=(HTTP_CONNECT_TIMEOUT, timeout_seconds),
+                stream=stream
+            )
+            
+            if response.status_code == 200 and stream:
+                with response:
+                    text, complete, error_type = read_claude_stream(
+                        response, time.monotonic() + CLAUDE_STREAM_MAX_SECONDS
+                    )
+                if complete and text:
+                    print(f"✅ {task_description} complete!")
+                    if use_cache and validate(text):
+                        write_disk_cache(CLAUDE_CACHE_DIR, cache_key, text)
+                    return text
+                if text:
+                    print(f"⚠️ {task_description} stream ended early after {len(text)} characters")
+                    return text
+                
+                wait_time = 30 if error_type == 'overloaded_error' else 5
+                print(f"⚠️ Stream failed before any text arrived, retrying in {wait_time} seconds... "
+                      f"(attempt {attempt + 1}/{max_retries})")
+                pause_rate_limit(CLAUDE_RATE_LIMITER, wait_time)
+                continue
             
             if response.status_code == 200:
                 result = response.json()
                 if 'content' in result and len(result['content']) > 0:
                     print(f"✅ {task_description} complete!")
-                    return result['content'][0]['text']
+                    usage = result.get('usage', {})
+                    if usage.get('cache_read_input_tokens') or usage.get('cache_creation_input_tokens'):
+                        print(f"   Prompt cache: {usage.get('cache_read_input_tokens', 0)} tokens read, "
+                              f"{usage.get('cache_creation_input_tokens', 0)} written")
+                    text = result['content'][0]['text']
+                    if use_cache and validate(text):
+                        write_disk_cache(CLAUDE_CACHE_DIR, cache_key, text)
+                    return text
                 else:
                     print(f"❌ Unexpected response structure")
                     return None
@@ -1191,15 +2882,15 @@ def call_claude_api_with_model(prompt, task_description, model=None):
                 print(f"❌ Model not found: {api_model}")
                 return None
             elif response.status_code == 429:
-                wait_time = min(30, 2 ** attempt * 3)
-                print(f"⚠️ Rate limited, waiting {wait_time} seconds... (attempt {attempt + 1}/{max_retries})")
-                time.sleep(wait_time)
+                wait_time = parse_retry_after(response.headers.get('retry-after'), min(30, 2 ** attempt * 3))
+                print(f"⚠️ Rate limited, all Claude workers waiting {wait_time:.0f} seconds... (attempt {attempt + 1}/{max_retries})")
+                pause_rate_limit(CLAUDE_RATE_LIMITER, wait_time)
                 continue
             elif response.status_code == 529:
                 if attempt < max_retries - 1:
                     wait_time = 30 + (attempt * 10)
-                    print(f"⚠️ Claude is overloaded. Waiting {wait_time} seconds before retry... (attempt {attempt + 1}/{max_retries})")
-                    time.sleep(wait_time)
+                    print(f"⚠️ Claude is overloaded. All Claude workers waiting {wait_time} seconds before retry... (attempt {attempt + 1}/{max_retries})")
+                    pause_rate_limit(CLAUDE_RATE_LIMITER, wait_time)
                     continue
                 else:
                     print("❌ Claude is temporarily overloaded. Please try again in a few minutes.")
@@ -1247,9 +2938,119 @@ def call_claude_api_with_model(prompt, task_description, model=None):
     print(f"❌ Failed after {max_retries} attempts")
     return None
 
-def call_claude_api(prompt, task_description):
-    """Generic Claude API call function with better error handling"""
-    return call_claude_api_with_model(prompt, task_description, CLAUDE_MODEL)
+# ==================== MESSAGE BATCHES ====================
+
+def run_claude_batch(prompt_specs, task_description, validate=None):
+    """Answer independent prompts through one Message Batches API job
+    
+    prompt_specs is a list of (prompt, model) pairs; responses come back in the
+    same order. Cached responses are reused (and new ones cached) when
+    validate(text) accepts them, and any prompt the batch did not answer falls
+    back to a direct call, so callers see the same results as in synchronous mode.
+    """
+    if not CLAUDE_API_KEY or CLAUDE_API_KEY == "your-api-key-here-for-testing":
+        print("\n❌ ERROR: No valid API key set!")
+        return [None] * len(prompt_specs)
+    
+    responses = [None] * len(prompt_specs)
+    pending = {}
+    for index, (prompt, model) in enumerate(prompt_specs):
+        data = build_claude_request(prompt, task_description, model)
+        cache_key = claude_cache_key(data)
+        if validate is not None and not CLAUDE_CACHE_BYPASS:
+            cached_text = read_disk_cache(CLAUDE_CACHE_DIR, cache_key, CLAUDE_CACHE_TTL_SECONDS)
+            if cached_text is not None and validate(cached_text):
+                responses[index] = cached_text
+                continue
+        pending[f"request-{index}"] = (index, data, cache_key)
+    
+    print(f"\n📮 {task_description}: {len(pending)} prompts as one message batch "
+          f"({len(prompt_specs) - len(pending)} cached)")
+    
+    if pending:
+        results = submit_claude_batch({custom_id: data for custom_id, (_, data, _) in pending.items()})
+        for custom_id, text in results.items():
+            if custom_id not in pending:
+                continue
+            index, _, cache_key = pending[custom_id]
+            responses[index] = text
+            if validate is not None and not CLAUDE_CACHE_BYPASS and validate(text):
+                write_disk_cache(CLAUDE_CACHE_DIR, cache_key, text)
+        
+        missing = [index for index, _, _ in pending.values() if responses[index] is None]
+        if missing:
+            print(f"⚠️ Batch left {len(missing)} prompts unanswered, calling them directly")
+        for index in missing:
+            prompt, model = prompt_specs[index]
+            responses[index] = call_claude_api_with_model(
+                prompt, f"{task_description} (prompt {index + 1}/{len(prompt_specs)})", model,
+                validate=validate
+            )
+    
+    return responses
+
+def submit_claude_batch(requests_by_id):
+    """Create a message batch, wait for it to end and return {custom_id: text} for succeeded requests"""
+    batches_url = f"{CLAUDE_API_BASE_URL}/v1/messages/batches"
+    headers = claude_api_headers()
+    payload = {
+        "requests": [{"custom_id": custom_id, "params": data} for custom_id, data in requests_by_id.items()]
+    }
+    
+    try:
+        acquire_rate_limit(CLAUDE_RATE_LIMITER)
+        response = get_http_session().post(batches_url, headers=headers, json=payload,
+                                           timeout=(HTTP_CONNECT_TIMEOUT, 60))
+        if response.status_code != 200:
+            print(f"❌ Batch submission failed with HTTP {response.status_code}: {response.text[:200]}")
+            return {}
+        batch = response.json()
+        print(f"   Batch {batch['id']} submitted")
+        
+        deadline = time.monotonic() + CLAUDE_BATCH_MAX_WAIT_SECONDS
+        while batch.get('processing_status') != 'ended':
+            if time.monotonic() >= deadline:
+                print(f"⚠️ Batch {batch['id']} still running after {CLAUDE_BATCH_MAX_WAIT_SECONDS}s, cancelling")
+                get_http_session().post(f"{batches_url}/{batch['id']}/cancel", headers=headers,
+                                        timeout=(HTTP_CONNECT_TIMEOUT, 30))
+                return {}
+            time.sleep(CLAUDE_BATCH_POLL_SECONDS)
+            
+            status = get_http_session().get(f"{batches_url}/{batch['id']}", headers=headers,
+                                            timeout=(HTTP_CONNECT_TIMEOUT, 30))
+            if status.status_code == 200:
+                batch = status.json()
+                counts = batch.get('request_counts', {})
+                print(f"   Batch {batch['id']}: {batch.get('processing_status')} "
+                      f"({counts.get('succeeded', 0)} succeeded, {counts.get('processing', 0)} processing)")
+            else:
+                print(f"   ⚠️ Batch status check returned HTTP {status.status_code}")
+        
+        results_url = batch.get('results_url') or f"{batches_url}/{batch['id']}/results"
+        results = {}
+        failed = 0
+        with get_http_session().get(results_url, headers=headers, stream=True,
+                                    timeout=(HTTP_CONNECT_TIMEOUT, 60)) as results_response:
+            if results_response.status_code != 200:
+                print(f"❌ Batch results download failed with HTTP {results_response.status_code}")
+                return {}
+            for line in results_response.iter_lines(decode_unicode=True):
+                if not line:
+                    continue
+                entry = json.loads(line)
+                result = entry.get('result', {})
+                content = result.get('message', {}).get('content', [])
+                if result.get('type') == 'succeeded' and content:
+                    results[entry['custom_id']] = content[0]['text']
+                else:
+                    failed += 1
+        
+        print(f"✅ Batch {batch['id']} complete: {len(results)} succeeded, {failed} failed")
+        return results
+    
+    except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+        print(f"❌ Message batch error: {str(e)[:100]}")
+        return {}
 
 def parse_json_with_fallback(response_text):
     """Parse JSON with multiple fallback strategies and improved error handling"""
@@ -1338,6 +3139,24 @@ def parse_json_with_fallback(response_text):
     print("❌ All JSON parsing attempts failed")
     return None
 
+def parse_json_quietly(response_text):
+    """Parse a JSON reply (optionally fenced or wrapped in prose) without logging, or return None"""
+    text = (response_text or '').strip()
+    text = re.sub(r'^```(?:json)?|```$', '', text).strip()
+    for candidate in (text, text[text.find('{'):text.rfind('}') + 1]):
+        try:
+            return json.loads(candidate)
+        except ValueError:
+            continue
+    return None
+
+def expects_json_keys(*keys):
+    """Build a response validator accepting JSON objects that contain every key"""
+    def validate(response_text):
+        parsed = parse_json_quietly(response_text)
+        return isinstance(parsed, dict) and all(key in parsed for key in keys)
+    return validate
+
 def fallback_selection(articles):
     """Fallback method to select articles if AI selection fails"""
     print("\n📊 Using fallback selection method...")
@@ -1371,8 +3190,12 @@ def main():
     print("📊 Using AI to select the most important global news")
     print("=" * 70)
     
-    # Initialize Excel file
-    initialize_excel_file()
+    # Initialize archive database
+    initialize_archive()
+    
+    evicted = evict_disk_cache(CLAUDE_CACHE_DIR, CLAUDE_CACHE_TTL_SECONDS, max_bytes=CLAUDE_CACHE_MAX_BYTES)
+    if evicted:
+        print(f"🧹 Evicted {evicted} old Claude cache entries")
     
     # Check API key
     if not CLAUDE_API_KEY or CLAUDE_API_KEY == "your-api-key-here-for-testing":
@@ -1383,8 +3206,8 @@ def main():
         # Create public directory if it doesn't exist
         os.makedirs('public', exist_ok=True)
         
-        # PHASE 1: Fetch previous articles from Excel
-        previous_articles = fetch_previous_articles_from_excel()
+        # PHASE 1: Fetch previous articles from the archive
+        previous_articles = fetch_previous_articles()
         
         # PHASE 2: Fetch news from GDELT
         articles = fetch_gdelt_news_last_24_hours()
@@ -1400,8 +3223,13 @@ def main():
             print("\n❌ No articles from approved sources found!")
             return
         
+        register_candidates(unique_articles)
+        
+        # PHASE 3.2: Rank locally so the LLM phases only see the strongest candidates
+        ranked_articles = prerank_articles(unique_articles)
+        
         # PHASE 3.5: Use Claude Sonnet to remove duplicate news stories
-        deduplicated_articles = deduplicate_with_claude(unique_articles)
+        deduplicated_articles = deduplicate_with_claude(ranked_articles)
         
         if not deduplicated_articles:
             print("\n❌ No articles remaining after deduplication!")
@@ -1441,14 +3269,18 @@ def main():
         # PHASE 6: Fetch full content for top 10
         print("\n🌐 Fetching full content for top 10 articles...")
         
+        scrape_started = time.monotonic()
+        scraped_content = scrape_articles_concurrently(top_10_articles)
+        print(f"   Fetched {len(scraped_content)}/{len(top_10_articles)} pages in {time.monotonic() - scrape_started:.1f}s")
+        
         articles_with_content = []
         for i, article in enumerate(top_10_articles, 1):
             title_preview = article['title'][:60]
             if len(article['title']) > 60:
                 title_preview += "..."
-            print(f"\n📄 Fetching article {i}/10: {title_preview}")
+            print(f"\n📄 Article {i}/{len(top_10_articles)}: {title_preview}")
             
-            content = scrape_article_content(article['url'])
+            content = scraped_content.get(article['url'])
             
             if content:
                 print(f"   ✓ Retrieved {len(content)} characters")
@@ -1456,14 +3288,7 @@ def main():
                 print(f"   ⚠️ Using title only (scraping failed)")
                 content = article['title']
             
-            try:
-                url_parts = article['url'].split('/')
-                if len(url_parts) >= 3:
-                    domain = url_parts[2].replace('www.', '')
-                else:
-                    domain = 'Unknown'
-            except:
-                domain = 'Unknown'
+            domain = extract_host(article['url']) or 'Unknown'
             
             source_map = {
                 'cnn.com': 'CNN',
@@ -1515,23 +3340,18 @@ def main():
         
         # PHASE 7: Rewrite articles
         print("\n✍️ Creating B2 English summaries...")
-        rewriting_prompt = create_rewriting_prompt(articles_with_content, previous_articles)
-        
-        final_response = call_claude_api(rewriting_prompt, "Rewriting articles in B2 English")
-        
-        if not final_response:
-            print("\n❌ Failed to rewrite articles")
-            return
-        
-        articles_data = parse_json_with_fallback(final_response)
+        articles_data = rewrite_articles(articles_with_content, previous_articles)
         if not articles_data:
-            print("\n❌ Failed to parse final response")
+            print("\n❌ Failed to rewrite articles")
             return
         
         if 'articles' not in articles_data or not articles_data['articles']:
             print("\n❌ No articles in final response")
             return
         
+        # Stamped here rather than in the prompt so reruns can reuse the cached rewrite
+        articles_data['generation_time'] = datetime.now().strftime('%I:%M %p UTC')
+        
         print(f"\n✅ Successfully created final digest with {len(articles_data['articles'])} articles")
         
         # PHASE 8: Generate daily greeting and reading time
@@ -1546,8 +3366,8 @@ def main():
         # PHASE 9: Generate historical events for today
         historical_events = generate_historical_events()
         
-        # PHASE 10: Save to Excel
-        save_articles_to_excel(articles_data, daily_greeting, reading_time, formatted_date)
+        # PHASE 10: Save to archive
+        save_articles_to_archive(articles_data, daily_greeting, reading_time, formatted_date)
         
         # PHASE 11: Save to JSON for website
         output_data = {
@@ -1564,7 +3384,9 @@ def main():
         
         print(f"\n✅ Successfully generated news digest!")
         print(f"📄 JSON saved to: {OUTPUT_JSON}")
-        print(f"📊 Excel archive: {EXCEL_FILE}")
+        print(f"📊 Archive: {ARCHIVE_DB}")
+        if EXCEL_EXPORT:
+            print(f"📊 Excel export: {EXCEL_FILE}")
         
         # Show preview
         print("\n📰 DIGEST PREVIEW:")
@@ -1597,6 +3419,19 @@ def main():
 
 # ==================== SCRIPT EXECUTION ====================
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tennews daily digest generator")
+    subcommands = parser.add_subparsers(dest='command')
+    search_parser = subcommands.add_parser('search', help="Search archived digests")
+    search_parser.add_argument('query', nargs='+', help="Keywords (all must match)")
+    search_parser.add_argument('--from', dest='start_date', help="Earliest date, YYYY-MM-DD")
+    search_parser.add_argument('--to', dest='end_date', help="Latest date, YYYY-MM-DD")
+    search_parser.add_argument('--limit', type=int, default=20, help="Maximum results (default 20)")
+    args = parser.parse_args()
+    
+    if args.command == 'search':
+        run_search_command(args)
+        raise SystemExit(0)
+    
     print("Welcome to Tennews Daily Digest - GitHub Version!")
     print("\nFeatures:")
     print("✓ AI-powered selection of top 10 global news")
@@ -1604,7 +3439,7 @@ if __name__ == "__main__":
     print("✓ Full content retrieval for selected articles")
     print("✓ B2 English summaries (40-50 words)")
     print("✓ Automatic duplicate detection")
-    print("✓ Excel archive for previous articles")
+    print("✓ SQLite archive for previous articles")
     print("✓ JSON output for Next.js website")
     print("\n🔧 Using Claude Opus 4.1 model")
     